@@ -1,5 +1,5 @@
-import copy
-from shapely.geometry import LineString
+import compiled_dictionary
+import instrumentation
 
 
 def load_crossword_puzzle(filename):
@@ -27,11 +27,10 @@ def load_dictionary(filename):
 	:return: list of words to use in dictionary
 	"""
     dictionary = []
-    with open(filename, 'r') as dfile:
-        wordslist = dfile.readlines()
-    for word in wordslist:
-        replaced = word.replace("\n", "")
-        dictionary.append(replaced)
+    word_matrices, _ = compiled_dictionary.load_dictionary(filename)
+    for words in word_matrices.values():
+        for word in words:
+            dictionary.append(word.tobytes().decode('Windows-1252'))
     return dictionary
 
 
@@ -128,14 +127,23 @@ def find_vertical_words(crossword):
     return vertical_words
 
 
-def backtracking(assigned_variable_list, not_assigned_variable_list, dictionary):
+def backtracking(assigned_variable_list, not_assigned_variable_list, dictionary, slots=None, stats=None):
     """
     This function implements the backtracking algorithm
     :param assigned_variable_list:
     :param not_assigned_variable_list:
-    :param dictionary: dictionary of words
+    :param dictionary: dictionary of words, grouped by length on the first call
+    :param slots: words by ID, built with the crossing table of the words on the first call
+    :param stats: Instrumentation, or None to disable
     :return: completed crossword puzzle
     """
+    instrumentation.enter_node(stats, len(assigned_variable_list))
+
+    if slots is None:
+        build_crossing_table(assigned_variable_list + not_assigned_variable_list)
+        slots = {word.word_id: word for word in assigned_variable_list + not_assigned_variable_list}
+        dictionary = words_by_length(dictionary)
+
     if len(not_assigned_variable_list) == 0:
         return assigned_variable_list
 
@@ -144,79 +152,187 @@ def backtracking(assigned_variable_list, not_assigned_variable_list, dictionary)
     possible_val = get_possible_values(var, assigned_variable_list, dictionary)
 
     for val in possible_val:
-        check_var = copy.deepcopy(var)
-        check_var.value = val
-        if check_constraint(check_var, assigned_variable_list):
+        instrumentation.count(stats, 'checks')
+        if check_constraint(var, val, slots):
             var.value = val
-            result = backtracking(assigned_variable_list + [var], not_assigned_variable_list[1:], dictionary)
+            result = backtracking(assigned_variable_list + [var], not_assigned_variable_list[1:], dictionary, slots,
+                                  stats)
             if result != None:
                 return result
             var.value = ''
+            instrumentation.count(stats, 'backtracks')
 
     return None
 
 
-def get_possible_values(var, assigned_variable_list, dictionary):
+def backjumping(assigned_variable_list, not_assigned_variable_list, dictionary, slots=None, stats=None):
     """
-	Function to return the possible values
-	:param var:
-	:param assigned_variable_list:
-	:param dictionary:
-	:return:
-	"""
-    possibles_values = []
+    This function implements the backtracking algorithm with conflict-directed backjumping. A dead end
+    returns the assigned words it conflicted with, and the search jumps back to the deepest of them.
+    :param assigned_variable_list:
+    :param not_assigned_variable_list:
+    :param dictionary: dictionary of words, grouped by length on the first call
+    :param slots: words by ID, built with the crossing table of the words on the first call
+    :param stats: Instrumentation, or None to disable
+    :return: completed crossword puzzle or None, conflict set (IDs of assigned words)
+    """
+    instrumentation.enter_node(stats, len(assigned_variable_list))
+
+    if slots is None:
+        build_crossing_table(assigned_variable_list + not_assigned_variable_list)
+        slots = {word.word_id: word for word in assigned_variable_list + not_assigned_variable_list}
+        dictionary = words_by_length(dictionary)
+
+    if len(not_assigned_variable_list) == 0:
+        return assigned_variable_list, set()
+
+    var = not_assigned_variable_list[0]
+    levels = {word.word_id: level for level, word in enumerate(assigned_variable_list)}
+
+    # words of the same length may have removed values already used
+    conflict = {word.word_id for word in assigned_variable_list if len(word.value) == var.length}
+
+    possible_val = get_possible_values(var, assigned_variable_list, dictionary)
+
+    for val in possible_val:
+        culprit = find_conflict(var, val, slots, levels)
+        if culprit is not None:
+            conflict.add(culprit)
+            continue
+
+        var.value = val
+        result, culprits = backjumping(assigned_variable_list + [var], not_assigned_variable_list[1:], dictionary,
+                                       slots, stats)
+        if result != None:
+            return result, set()
+        var.value = ''
 
-    for val in dictionary:
-        if len(val) == var.length:
-            possibles_values.append(val)
+        if var.word_id not in culprits:
+            return None, culprits
+        conflict |= culprits - {var.word_id}
 
-    for item in assigned_variable_list:
-        if item.value in possibles_values:
-            possibles_values.remove(item.value)
+    return None, conflict
 
-    return possibles_values
+
+def solve_stoppable(crossword, dictionary, seconds=None, cancel=None, check_every=16, cbj=False, stats=None):
+    """
+    Solves a crossword puzzle with a deadline and a cancellation token checked cooperatively by the search,
+    without signals or a process to kill
+    :param crossword: crossword puzzle from load_crossword_puzzle
+    :param dictionary: dictionary of words
+    :param seconds: time allowed to the search, None for no deadline
+    :param cancel: token whose is_set() stops the search (threading.Event, multiprocessing.Event...), None for
+    none
+    :param check_every: number of nodes between two checks of the deadline and the token
+    :param cbj: Boolean for conflict-directed backjumping
+    :param stats: Instrumentation, or None for a new one
+    :return: instrumentation.SolveResult, with the assigned words when solved
+    """
+    if stats is None:
+        stats = instrumentation.Instrumentation()
+    words = find_horizontal_words(crossword) + find_vertical_words(crossword)
+
+    def solve():
+        if cbj:
+            return backjumping([], words, dictionary, stats=stats)[0]
+        return backtracking([], words, dictionary, stats=stats)
+
+    return instrumentation.stoppable_solve(solve, stats, seconds, cancel, check_every)
+
+
+def words_by_length(dictionary):
+    """
+    Groups the words of a dictionary by length, each word once
+    :param dictionary: dictionary of words, or words already grouped by length
+    :return: dictionary of length -> list of words
+    """
+    if isinstance(dictionary, dict):
+        return dictionary
+
+    by_length = {}
+    for val in dict.fromkeys(dictionary):
+        by_length.setdefault(len(val), []).append(val)
+    return by_length
 
 
-def check_constraint(var, assigned_variable_list):
+def get_possible_values(var, assigned_variable_list, dictionary):
     """
-	Function to validate constraints
+	Function to return the possible values. Words already assigned are left out, so that no word appears
+	twice in the puzzle.
 	:param var:
 	:param assigned_variable_list:
-	:return:
+	:param dictionary: words grouped by length, see words_by_length
+	:return: iterator of values
 	"""
-    if assigned_variable_list is not None:
-        for word in assigned_variable_list:
-            # if orientation is equal they will never interesect!
-            if var.orientation != word.orientation:
-                intersection = check_intersections(var, word)
-                if len(intersection) != 0:
-                    if var.orientation == 0:  # horizontal
-                        if var.value[int(intersection[0][1] - var.start_coord[1])] != word.value[
-                            int(intersection[0][0] - word.start_coord[0])]:
-                            return False
-                    else:  # vertical
-                        if var.value[int(intersection[0][0] - var.start_coord[0])] != word.value[
-                            int(intersection[0][1] - word.start_coord[1])]:
-                            return False
-    return True
+    used = {item.value for item in assigned_variable_list if item.length == var.length}
+    if not used:
+        return iter(dictionary.get(var.length, ()))
+    return (val for val in dictionary.get(var.length, ()) if val not in used)
 
 
-def check_intersections(w1, w2):
+def build_crossing_table(words):
     """
-	Check to see if words are intersecting.
-	:param w1: word 1
-	:param w2: word 2
+    Compiles the crossings of the puzzle into integer offsets. Each word gets an ID (its index in words) and
+    the list of its crossings (ID of crossed word, offset in this word, offset in crossed word).
+    :param words: horizontal and vertical words
+    :return: crossing table as (word A, offset in A, word B, offset in B)
+    """
+    crossing_table = []
+
+    for word_id, word in enumerate(words):
+        word.word_id = word_id
+        word.crossings = []
+
+    for a, word_a in enumerate(words):
+        if word_a.orientation != 0:
+            continue
+        row = word_a.start_coord[0]
+        for b, word_b in enumerate(words):
+            if word_b.orientation != 1:
+                continue
+            column = word_b.start_coord[1]
+            if word_a.start_coord[1] <= column <= word_a.end_coord[1] and \
+                    word_b.start_coord[0] <= row <= word_b.end_coord[0]:
+                offset_a = column - word_a.start_coord[1]
+                offset_b = row - word_b.start_coord[0]
+                crossing_table.append((a, offset_a, b, offset_b))
+                word_a.crossings.append((b, offset_a, offset_b))
+                word_b.crossings.append((a, offset_b, offset_a))
+
+    return crossing_table
+
+
+def check_constraint(var, value, slots):
+    """
+	Function to validate constraints against the crossing words already assigned
+	:param var: word to assign
+	:param value: candidate value for var
+	:param slots: words by ID
 	:return:
 	"""
-    line1 = LineString([w1.start_coord, w1.end_coord])
-    line2 = LineString([w2.start_coord, w2.end_coord])
+    for crossed_id, offset, crossed_offset in var.crossings:
+        crossed_value = slots[crossed_id].value
+        if crossed_value and crossed_value[crossed_offset] != value[offset]:
+            return False
+    return True
 
-    intersection_point = line1.intersection(line2)
 
-    if not intersection_point.is_empty:
-        return [intersection_point.coords[0]]  # result(float)
-    else:
-        return []
+def find_conflict(var, value, slots, levels):
+    """
+	Function to find the earliest assigned crossing word conflicting with a value
+	:param var: word to assign
+	:param value: candidate value for var
+	:param slots: words by ID
+	:param levels: position of each assigned word in the assignment order, by ID
+	:return: ID of the conflicting word or None
+	"""
+    culprit = None
+    for crossed_id, offset, crossed_offset in var.crossings:
+        crossed_value = slots[crossed_id].value
+        if crossed_value and crossed_value[crossed_offset] != value[offset]:
+            if culprit is None or levels[crossed_id] < levels[culprit]:
+                culprit = crossed_id
+    return culprit
 
 
 def insert_word_to_puzzle(crossword, word, coord, orientation):
@@ -238,9 +354,10 @@ def insert_word_to_puzzle(crossword, word, coord, orientation):
     return crossword
 
 
-def execute_backtracking():
+def execute_backtracking(cbj=False):
     """
 	Runs the application.
+	:param cbj: Boolean for conflict-directed backjumping
 	:return:
 	"""
 
@@ -250,7 +367,10 @@ def execute_backtracking():
     vertical_word = find_vertical_words(cw_puzzle)
     total_words = horizontal_word + vertical_word
     assign_var_list = []
-    suggested_solution = backtracking(assign_var_list, total_words, dictionary)
+    if cbj:
+        suggested_solution, _ = backjumping(assign_var_list, total_words, dictionary)
+    else:
+        suggested_solution = backtracking(assign_var_list, total_words, dictionary)
 
     print("---------- Crossword ---------")
     for line in cw_puzzle:
@@ -269,15 +389,21 @@ def execute_backtracking():
 
 
 class Word:
-    # coordinates of the starting and ending point
-    start_coord = ()
-    end_coord = ()
+    def __init__(self):
+        # coordinates of the starting and ending point
+        self.start_coord = ()
+        self.end_coord = ()
+
+        # horizontal word = 0, vertical word = 1
+        self.orientation = 0
 
-    # horizontal word = 0, vertical word = 1
-    orientation = 0
+        # word length
+        self.length = 0
 
-    # word length
-    length = 0
+        # value assigned to this word
+        self.value = ''
 
-    # value assigned to this word
-    value = ''
+        # index in the list of words and crossings (ID of crossed word, offset in this word, offset in crossed
+        # word), set by build_crossing_table
+        self.word_id = None
+        self.crossings = []
@@ -0,0 +1,113 @@
+import argparse
+import fnmatch
+import multiprocessing
+import os
+import time
+
+import forward_checking
+import pattern_cache
+import shared_dictionary
+
+# Dictionary mapped by each pool worker and its pattern cache, reused by every puzzle of the worker, see
+# attach_worker
+worker_dictionary = None
+worker_patterns = None
+
+
+class BatchResult:
+    def __init__(self, name, solution, status, elapsed):
+        self.name = name
+        self.solution = solution
+        self.status = status
+        self.elapsed = elapsed
+
+
+def list_puzzles(puzzles, pattern='crossword_*.txt'):
+    """
+    Lists the puzzle files of a batch
+    :param puzzles: directory of puzzle files, or iterable of puzzle file names
+    :param pattern: file name pattern of the puzzles in a directory
+    :return: iterator of puzzle file names
+    """
+    if isinstance(puzzles, str):
+        return iter(sorted(os.path.join(puzzles, name) for name in os.listdir(puzzles)
+                           if fnmatch.fnmatch(name, pattern)))
+    return iter(puzzles)
+
+
+def attach_worker(shared):
+    """
+    Pool initializer mapping the shared dictionary into the worker
+    :param shared: description of the shared dictionary
+    :return: None
+    """
+    global worker_dictionary, worker_patterns
+    worker_dictionary = shared_dictionary.attach_dictionary(shared)
+    worker_patterns = pattern_cache.create_pattern_cache(*worker_dictionary[:2])
+
+
+def solve_puzzle(task):
+    """
+    Solves one puzzle of a batch in a pool worker
+    :param task: (crossword file name, seconds allowed or None, ac3, cbj)
+    :return: BatchResult
+    """
+    name, timeout, ac3, cbj = task
+    dictionary, letter_index, _ = worker_dictionary
+    start = time.time()
+
+    try:
+        crossword = forward_checking.load_crossword(name)
+        result = forward_checking.solve_stoppable(crossword, dictionary, letter_index, timeout, ac3=ac3, cbj=cbj,
+                                                  patterns=worker_patterns)
+        solution, status = result.solution, result.status
+    except Exception as exc:
+        solution, status = None, f'error: {exc}'
+
+    return BatchResult(name, solution, status, time.time() - start)
+
+
+def solve_batch(puzzles, dictionary_name, workers=None, timeout=None, ac3=True, cbj=False):
+    """
+    Solves a batch of puzzles over a process pool. The dictionary is loaded and indexed once and placed in
+    shared memory for all workers. Results are yielded as soon as each puzzle completes, in completion order.
+    :param puzzles: directory of puzzle files, or iterable of puzzle file names
+    :param dictionary_name: Name of dictionary text file
+    :param workers: number of worker processes, one per core by default
+    :param timeout: seconds allowed per puzzle, None for no limit
+    :param ac3: Boolean for arc consistency propagation
+    :param cbj: Boolean for conflict-directed backjumping
+    :return: iterator of BatchResult
+    """
+    dictionary, letter_index = forward_checking.fill_dict(dictionary_name)
+    shared, handles = shared_dictionary.share_dictionary(dictionary, letter_index)
+    tasks = ((name, timeout, ac3, cbj) for name in list_puzzles(puzzles))
+
+    try:
+        with multiprocessing.Pool(workers, initializer=attach_worker, initargs=(shared,)) as pool:
+            for result in pool.imap_unordered(solve_puzzle, tasks):
+                yield result
+    finally:
+        shared_dictionary.release_dictionary(handles)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solves every crossword of a directory')
+    parser.add_argument('directory')
+    parser.add_argument('dictionary')
+    parser.add_argument('--pattern', default='crossword_*.txt')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=None)
+    parser.add_argument('--cbj', action='store_true')
+    args = parser.parse_args()
+
+    batch_start = time.time()
+    count = 0
+    for batch_result in solve_batch(list_puzzles(args.directory, args.pattern), args.dictionary, args.workers,
+                                    args.timeout, cbj=args.cbj):
+        count += 1
+        print(f"{batch_result.name}: {batch_result.status} in {batch_result.elapsed:.3f} seconds")
+        if batch_result.solution is not None:
+            forward_checking.print_crossword(batch_result.solution)
+    batch_elapsed = time.time() - batch_start
+    print(f"\n{count} grids in {batch_elapsed:.3f} seconds, {count / batch_elapsed:.1f} grids per second")
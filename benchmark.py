@@ -0,0 +1,611 @@
+import argparse
+import io
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import random
+import resource
+import signal
+import sys
+import time
+
+import numpy as np
+
+import backtracking
+import forward_checking
+import instrumentation
+import packed_words
+import pattern_cache
+
+
+def scan_domain(domain_words, position, letter):
+    """
+    Narrows a domain by scanning the letter column of its words (previous update_domains behaviour)
+    :param domain_words: numpy matrix of the words in the domain
+    :param position: position of the letter in the word
+    :param letter: ASCII code of the letter
+    :return: narrowed numpy matrix of words
+    """
+    sub_index = np.where(domain_words[:, position] == letter)
+    return domain_words[sub_index]
+
+
+def crossing_queries(crossword_name, dictionary, letter_index):
+    """
+    Lists every (slot, position, letter) narrowing the forward checking can run on a crossword
+    :param crossword_name: Name of crossword text file
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :return: list of (word matrix, domain indexes, positional letter index, position, letter)
+    """
+    crossword = forward_checking.load_crossword(crossword_name)
+    words = forward_checking.create_words(crossword)
+
+    queries = []
+    for w in words:
+        if w.length not in dictionary:
+            continue
+        domain_ids = np.arange(dictionary[w.length].shape[0], dtype=forward_checking.DOMAIN_DTYPE)
+        for inter in w.intersections:
+            for letter in range(ord('a'), ord('z') + 1):
+                queries.append((dictionary[w.length], domain_ids, letter_index[w.length], inter.index, letter))
+    return queries
+
+
+def benchmark_letter_index(crossword_name, dictionary_name, repeat=5):
+    """
+    Times domain narrowing with the column scan against the positional letter index
+    :param crossword_name: Name of crossword text file
+    :param dictionary_name: Name of dictionary text file
+    :param repeat: number of passes over all queries
+    :return: (scan seconds, index seconds)
+    """
+    dictionary, letter_index = forward_checking.fill_dict(dictionary_name)
+    queries = crossing_queries(crossword_name, dictionary, letter_index)
+
+    scan_start = time.perf_counter()
+    for _ in range(repeat):
+        for domain_words, _, _, position, letter in queries:
+            scan_domain(domain_words, position, letter)
+    scan_elapsed = time.perf_counter() - scan_start
+
+    index_start = time.perf_counter()
+    for _ in range(repeat):
+        for _, domain_ids, index, position, letter in queries:
+            forward_checking.narrow_domain(domain_ids, index, position, letter)
+    index_elapsed = time.perf_counter() - index_start
+
+    print(f"{crossword_name}: {len(queries) * repeat} narrowings, "
+          f"scan {scan_elapsed:.4f}s, index {index_elapsed:.4f}s, "
+          f"speedup {scan_elapsed / index_elapsed:.2f}x")
+
+    return scan_elapsed, index_elapsed
+
+
+def pattern_queries(crossword_name, dictionary, seed=0):
+    """
+    Draws the patterns a partly filled crossword puts on its slots: for each slot and each number of filled
+    crossings, the letters of a random word at that many of its crossing positions
+    :param crossword_name: Name of crossword text file
+    :param dictionary: numpy word matrices by length
+    :param seed: seed of the drawn words and positions
+    :return: list of (length, pattern bytes with 0 for a free cell)
+    """
+    rng = np.random.default_rng(seed)
+    crossword = forward_checking.load_crossword(crossword_name)
+    words = forward_checking.create_words(crossword)
+
+    queries = []
+    for w in words:
+        if w.length not in dictionary:
+            continue
+        positions = [inter.index for inter in w.intersections]
+        for filled in range(1, len(positions) + 1):
+            word = dictionary[w.length][rng.integers(dictionary[w.length].shape[0])]
+            pattern = np.zeros(w.length, dtype=np.uint8)
+            for position in rng.choice(positions, filled, replace=False):
+                pattern[position] = word[position]
+            queries.append((w.length, pattern.tobytes()))
+    return queries
+
+
+def benchmark_packed(crossword_name, dictionary_name, repeat=5):
+    """
+    Times pattern matching over whole domains on the uint8 word matrices (column compares, then positional
+    letter index) against the packed words, and the check of single candidates letter by letter against
+    one packed compare
+    :param crossword_name: Name of crossword text file
+    :param dictionary_name: Name of dictionary text file
+    :param repeat: number of passes over all queries
+    :return: dictionary of seconds by method
+    """
+    dictionary, letter_index = forward_checking.fill_dict(dictionary_name)
+    packed = packed_words.create_packed_dictionary(dictionary)
+    queries = [(length, key) for length, key in pattern_queries(crossword_name, dictionary) if length in packed.words]
+    domains = {k: np.arange(v.shape[0], dtype=forward_checking.DOMAIN_DTYPE) for k, v in dictionary.items()}
+
+    def scan(length, key, fixed, query):
+        matrix, ids = dictionary[length], domains[length]
+        mask = np.ones(ids.shape[0], dtype=bool)
+        for position, letter in fixed:
+            mask &= matrix[ids, position] == letter
+        return mask
+
+    def index(length, key, fixed, query):
+        ids = domains[length]
+        mask = np.ones(ids.shape[0], dtype=bool)
+        for position, letter in fixed:
+            mask &= forward_checking.letter_mask(ids, letter_index[length], position, letter)
+        return mask
+
+    def pack(length, key, fixed, query):
+        return packed_words.match_ids(packed, length, domains[length], packed_words.pattern_query(packed, key))
+
+    # a candidate is checked against the pattern of its slot, computed once for all the candidates of a node
+    def check_letters(length, key, fixed, query):
+        word = dictionary[length][0]
+        return all(word[position] == letter for position, letter in fixed)
+
+    def check_packed(length, key, fixed, query):
+        return packed_words.fits(packed, length, 0, query)
+
+    prepared = [(length, key, [(position, letter) for position, letter in enumerate(key) if letter],
+                 packed_words.pattern_query(packed, key)) for length, key in queries]
+    for query in prepared:
+        if not (np.array_equal(scan(*query), pack(*query)) and np.array_equal(index(*query), pack(*query)) and
+                check_letters(*query) == check_packed(*query)):
+            raise AssertionError(f"packed match differs on {query[1]!r}")
+
+    elapsed = {}
+    for name, method in (('scan', scan), ('index', index), ('packed', pack),
+                         ('check letters', check_letters), ('check packed', check_packed)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for query in prepared:
+                method(*query)
+        elapsed[name] = time.perf_counter() - start
+
+    print(f"{crossword_name}: {len(queries) * repeat} patterns, "
+          f"domains: scan {elapsed['scan']:.4f}s, index {elapsed['index']:.4f}s, packed {elapsed['packed']:.4f}s; "
+          f"candidates: letters {elapsed['check letters']:.4f}s, packed {elapsed['check packed']:.4f}s")
+
+    return elapsed
+
+
+def solve_trial(crossword_name, dictionary_name, seed, ac3, queue):
+    """
+    Solves a crossword once with forward checking and sends the explored nodes to a queue
+    :param crossword_name: Name of crossword text file
+    :param dictionary_name: Name of dictionary text file
+    :param seed: seed of the dictionary shuffle
+    :param ac3: Boolean for arc consistency propagation
+    :param queue: multiprocessing queue receiving the number of nodes
+    :return: None
+    """
+    crossword = forward_checking.load_crossword(crossword_name)
+    words = forward_checking.create_words(crossword)
+    dictionary, letter_index = forward_checking.fill_dict(dictionary_name)
+    domains, words = forward_checking.create_domains(dictionary, letter_index, words, np.random.default_rng(seed))
+
+    stats = instrumentation.Instrumentation()
+    if ac3 and not forward_checking.arc_consistency(words, domains):
+        queue.put(stats.nodes)
+        return
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        forward_checking.backtracking_forward_checking({}, words, domains, 0, crossword, ac3, stats)
+    queue.put(stats.nodes)
+
+
+def benchmark_arc_consistency(crossword_name, dictionary_name, seeds=range(5), timeout=10):
+    """
+    Counts the nodes explored by forward checking with and without arc consistency propagation
+    :param crossword_name: Name of crossword text file
+    :param dictionary_name: Name of dictionary text file
+    :param seeds: seeds of the dictionary shuffles, one solve per seed and mode
+    :param timeout: seconds before a solve is stopped
+    :return: list of (seed, nodes without AC-3, nodes with AC-3), None for a stopped solve
+    """
+    results = []
+
+    for seed in seeds:
+        nodes = []
+        for ac3 in (False, True):
+            queue = multiprocessing.Queue()
+            p = multiprocessing.Process(target=solve_trial, args=(crossword_name, dictionary_name, seed, ac3, queue))
+            p.start()
+            p.join(timeout)
+            if p.is_alive():
+                p.kill()
+                p.join()
+                nodes.append(None)
+            else:
+                nodes.append(queue.get())
+        results.append((seed, nodes[0], nodes[1]))
+
+        fc_nodes, ac3_nodes = [f"{n} nodes" if n is not None else f"stopped after {timeout}s" for n in nodes]
+        print(f"{crossword_name} seed {seed}: forward checking {fc_nodes}, with AC-3 {ac3_nodes}")
+
+    return results
+
+
+def break_long_runs(grid, max_length, rng):
+    """
+    Places blocks (keeping the rotational symmetry) until no run of open cells is longer than max_length
+    :param grid: crossword puzzle, updated in place
+    :param max_length: longest word allowed
+    :param rng: numpy random generator
+    :return: crossword puzzle
+    """
+    size = grid.shape[0]
+    changed = True
+    while changed:
+        changed = False
+        for view in (grid, grid.T):
+            for x in range(size):
+                length = 0
+                for y in range(size + 1):
+                    if y < size and view[x][y] != 35:
+                        length += 1
+                        continue
+                    if length > max_length:
+                        block_y = y - length + int(rng.integers(1, length - 1))
+                        view[x][block_y] = 35
+                        view[size - 1 - x][size - 1 - block_y] = 35
+                        changed = True
+                    length = 0
+    return grid
+
+
+def generate_grid(size, density, seed, max_length=12):
+    """
+    Generates a square crossword puzzle with randomly placed, rotationally symmetric blocks
+    :param size: number of rows and columns
+    :param density: probability of a cell being a block
+    :param seed: seed of the block placement
+    :param max_length: longest word allowed
+    :return: numpy matrix containing crossword puzzle (0 for open cells, 35 for blocks)
+    """
+    rng = np.random.default_rng(seed)
+    blocks = rng.random((size, size)) < density
+    blocks |= blocks[::-1, ::-1]
+
+    grid = np.zeros((size, size), dtype=np.uint8)
+    grid[blocks] = 35
+    return break_long_runs(grid, max_length, rng)
+
+
+def run_backtracking(crossword, dictionary, letter_index, seed, stats):
+    """
+    Benchmark engine: simple backtracking from backtracking.py
+    :return: True if solved
+    """
+    puzzle = [['#' if cell == 35 else '0' for cell in row] for row in crossword]
+    word_list = [word.tobytes().decode('Windows-1252') for words in dictionary.values() for word in words]
+    random.Random(seed).shuffle(word_list)
+
+    words = backtracking.find_horizontal_words(puzzle) + backtracking.find_vertical_words(puzzle)
+    return backtracking.backtracking([], words, word_list, stats=stats) is not None
+
+
+def run_solver(options, crossword, dictionary, letter_index, seed, stats):
+    """
+    Benchmark engine: forward checking through solve_crossword
+    :param options: keyword arguments of solve_crossword, see SOLVER_ENGINES
+    :return: True if solved
+    """
+    arguments = {key: value(dictionary, letter_index) if callable(value) else value
+                 for key, value in options.items()}
+    return forward_checking.solve_crossword(crossword, dictionary, letter_index, rng=np.random.default_rng(seed),
+                                            stats=stats, **arguments) is not None
+
+
+def run_decompose(crossword, dictionary, letter_index, seed, stats):
+    """
+    Benchmark engine: forward checking solving the independent components of the grid separately
+    :return: True if solved
+    """
+    rng = np.random.default_rng(seed)
+    return forward_checking.solve_decomposed(crossword, dictionary, letter_index, rng=rng, stats=stats) is not None
+
+
+def run_portfolio(crossword, dictionary, letter_index, seed, stats):
+    """
+    Benchmark engine: forward checking workers racing with different value orderings, one per core
+    :return: True if solved
+    """
+    return forward_checking.portfolio_solve(crossword, dictionary, letter_index, seed=seed) is not None
+
+
+def run_stealing(crossword, dictionary, letter_index, seed, stats):
+    """
+    Benchmark engine: forward checking tree shared by workers through work stealing, one per core
+    :return: True if solved
+    """
+    return forward_checking.stealing_solve(crossword, dictionary, letter_index, seed=seed) is not None
+
+
+# keyword arguments of solve_crossword by engine run through run_solver. A callable value builds the argument
+# from the dictionary and its letter index.
+SOLVER_ENGINES = {
+    'forward_checking': {},
+    'ac3': {'ac3': True},
+    'cbj': {'cbj': True},
+    'restarts': {'restarts': 'luby'},
+    'domwdeg': {'restarts': 'luby', 'ordering': 'domwdeg'},
+    'lcv': {'lcv': True},
+    'patterns': {'patterns': pattern_cache.create_pattern_cache},
+    'packed': {'packed': lambda dictionary, letter_index: packed_words.create_packed_dictionary(dictionary)},
+}
+
+ENGINES = {
+    'backtracking': run_backtracking,
+    **{name: functools.partial(run_solver, options) for name, options in SOLVER_ENGINES.items()},
+    'decompose': run_decompose,
+    'portfolio': run_portfolio,
+    'stealing': run_stealing,
+}
+
+# engines searching in worker processes: their nodes are not counted and depend on the scheduling
+PARALLEL_ENGINES = {'portfolio', 'stealing'}
+
+
+def suite_trial(engine, crossword, dictionary_name, seed, queue):
+    """
+    Runs one engine on one grid and sends its measures to a queue
+    :param engine: name of the engine in ENGINES
+    :param crossword: crossword puzzle
+    :param dictionary_name: Name of dictionary text file
+    :param seed: seed of the dictionary shuffle
+    :param queue: multiprocessing queue receiving the measures
+    :return: None
+    """
+    # the workers of parallel engines join the group of the trial, so that a timeout kills them too
+    os.setpgid(0, 0)
+    dictionary, letter_index = forward_checking.fill_dict(dictionary_name)
+    stats = instrumentation.Instrumentation()
+
+    start = time.perf_counter()
+    solved = ENGINES[engine](crossword, dictionary, letter_index, seed, stats)
+    wall = time.perf_counter() - start
+
+    record = {'status': 'solved' if solved else 'unsatisfiable', 'wall': wall, 'nodes': None, 'backtracks': None,
+              'checks': None, 'wipeouts': None, 'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    if engine not in PARALLEL_ENGINES:
+        record.update({'nodes': stats.nodes, 'backtracks': stats.backtracks, 'checks': stats.checks,
+                       'wipeouts': sum(stats.wipeouts.values())})
+    queue.put(record)
+
+
+def run_suite(engines, sizes, densities, grid_seeds, seeds, dictionary_name, timeout=10, max_length=12):
+    """
+    Runs every engine on generated grids, each run in its own process so that it can be stopped and its peak
+    memory measured alone
+    :param engines: names of engines in ENGINES
+    :param sizes: grid sizes
+    :param densities: block densities
+    :param grid_seeds: seeds of the grid generation
+    :param seeds: seeds of the dictionary shuffle
+    :param dictionary_name: Name of dictionary text file
+    :param timeout: seconds before a run is stopped
+    :param max_length: longest word allowed in generated grids
+    :return: list of result records
+    """
+    forward_checking.fill_dict(dictionary_name)  # compile the dictionary once before timing anything
+    results = []
+
+    for size in sizes:
+        for density in densities:
+            for grid_seed in grid_seeds:
+                crossword = generate_grid(size, density, grid_seed, max_length)
+                for seed in seeds:
+                    for engine in engines:
+                        queue = multiprocessing.Queue()
+                        p = multiprocessing.Process(target=suite_trial,
+                                                    args=(engine, crossword, dictionary_name, seed, queue))
+                        p.start()
+                        p.join(timeout)
+                        if p.is_alive():
+                            try:
+                                os.killpg(p.pid, signal.SIGKILL)
+                            except ProcessLookupError:
+                                pass
+                            p.join()
+                            record = {'status': 'timeout', 'wall': float(timeout), 'nodes': None,
+                                      'backtracks': None, 'peak_rss_kb': None}
+                        else:
+                            record = queue.get()
+                        record.update({'engine': engine, 'size': size, 'density': density,
+                                       'grid_seed': grid_seed, 'seed': seed})
+                        results.append(record)
+                        print(f"{engine:>16} {size:2}x{size:<2} density {density:.2f} grid {grid_seed} "
+                              f"seed {seed}: {record['status']} in {record['wall']:.3f}s, "
+                              f"{record['nodes']} nodes, {record['backtracks']} backtracks", flush=True)
+
+    return results
+
+
+def scaling_trial(crossword, dictionary_name, workers, seed, queue):
+    """
+    Solves one grid with the work-stealing search and sends its status and wall time to a queue
+    :param crossword: crossword puzzle
+    :param dictionary_name: Name of dictionary text file
+    :param workers: number of worker processes
+    :param seed: seed of the dictionary shuffle of the first worker
+    :param queue: multiprocessing queue receiving (status, wall)
+    :return: None
+    """
+    # the workers join the group of the trial, so that a timeout kills them too
+    os.setpgid(0, 0)
+    dictionary, letter_index = forward_checking.fill_dict(dictionary_name)
+
+    start = time.perf_counter()
+    solved = forward_checking.stealing_solve(crossword, dictionary, letter_index, workers, seed=seed)
+    wall = time.perf_counter() - start
+    queue.put(('solved' if solved is not None else 'unsatisfiable', wall))
+
+
+def run_scaling(worker_counts, sizes, densities, grid_seeds, seed, dictionary_name, timeout=60, max_length=12):
+    """
+    Measures the speedup of the work-stealing search over forward checking in one process, per number of
+    workers. A stopped run counts as the timeout, so the speedups involving it are bounds.
+    :param worker_counts: numbers of worker processes
+    :param sizes: grid sizes
+    :param densities: block densities
+    :param grid_seeds: seeds of the grid generation
+    :param seed: seed of the dictionary shuffle
+    :param dictionary_name: Name of dictionary text file
+    :param timeout: seconds before a run is stopped
+    :param max_length: longest word allowed in generated grids
+    :return: total wall time of forward checking and of the work-stealing search by number of workers
+    """
+    forward_checking.fill_dict(dictionary_name)  # compile the dictionary once before timing anything
+    totals = {0: 0.0}
+    totals.update((workers, 0.0) for workers in worker_counts)
+
+    for size in sizes:
+        for density in densities:
+            for grid_seed in grid_seeds:
+                crossword = generate_grid(size, density, grid_seed, max_length)
+                walls = {}
+                for workers in [0] + list(worker_counts):
+                    queue = multiprocessing.Queue()
+                    if workers == 0:
+                        p = multiprocessing.Process(target=suite_trial, args=('forward_checking', crossword,
+                                                                              dictionary_name, seed, queue))
+                    else:
+                        p = multiprocessing.Process(target=scaling_trial,
+                                                    args=(crossword, dictionary_name, workers, seed, queue))
+                    p.start()
+                    p.join(timeout)
+                    if p.is_alive():
+                        try:
+                            os.killpg(p.pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+                        p.join()
+                        status, wall = 'timeout', float(timeout)
+                    elif workers == 0:
+                        record = queue.get()
+                        status, wall = record['status'], record['wall']
+                    else:
+                        status, wall = queue.get()
+                    walls[workers] = wall
+                    totals[workers] += wall
+                    label = 'forward checking' if workers == 0 else f"{workers} workers"
+                    print(f"{size:2}x{size:<2} density {density:.2f} grid {grid_seed} {label:>16}: {status} in "
+                          f"{wall:.3f}s, speedup {walls[0] / wall:.2f}x", flush=True)
+
+    for workers in worker_counts:
+        print(f"{workers:3} workers: {totals[workers]:.3f}s against {totals[0]:.3f}s, "
+              f"speedup {totals[0] / totals[workers]:.2f}x")
+    return totals
+
+
+def record_key(record):
+    """
+    Identifies the run of a result record
+    :param record: result record
+    :return: (engine, size, density, grid seed, seed)
+    """
+    return record['engine'], record['size'], record['density'], record['grid_seed'], record['seed']
+
+
+def compare_results(baseline, results, tolerance=0.1, min_seconds=0.05):
+    """
+    Compares results with a baseline run of the suite. Per engine, total wall time over the runs present in
+    both is a regression when it grows by more than the tolerance and by more than min_seconds, which keeps
+    timer noise on tiny totals out. Node counts are deterministic for a seed, so any change is a regression:
+    the search itself changed. Parallel engines and timed out runs have no node count to compare.
+    :param baseline: result records of the baseline
+    :param results: result records to check
+    :param tolerance: allowed relative slowdown
+    :param min_seconds: slowdown in seconds below which a change is noise
+    :return: list of regression messages
+    """
+    previous = {record_key(record): record for record in baseline}
+    totals = {}
+    regressions = []
+
+    for record in results:
+        old = previous.get(record_key(record))
+        if old is None:
+            continue
+        engine = record['engine']
+        old_wall, new_wall = totals.get(engine, (0.0, 0.0))
+        totals[engine] = (old_wall + old['wall'], new_wall + record['wall'])
+        if old['status'] != record['status']:
+            regressions.append(f"{record_key(record)}: status {old['status']} -> {record['status']}")
+        elif old['nodes'] is not None and record['nodes'] is not None and old['nodes'] != record['nodes']:
+            regressions.append(f"{record_key(record)}: nodes {old['nodes']} -> {record['nodes']}")
+
+    for engine, (old_wall, new_wall) in totals.items():
+        ratio = new_wall / old_wall if old_wall else 1.0
+        print(f"{engine:>16}: {old_wall:.3f}s -> {new_wall:.3f}s ({ratio:.2f}x)")
+        if ratio > 1 + tolerance and new_wall - old_wall > min_seconds:
+            regressions.append(f"{engine}: wall time {ratio:.2f}x the baseline")
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Crossword solver benchmarks')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('index', help='positional letter index against the column scan')
+    commands.add_parser('ac3', help='nodes saved by AC-3 on the bundled puzzles')
+    commands.add_parser('packed', help='bit-packed words against the uint8 word matrices')
+    suite = commands.add_parser('suite', help='engines on generated grids')
+    suite.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    suite.add_argument('--sizes', nargs='+', type=int, default=[5, 7, 9, 11, 13, 15, 17, 19, 21])
+    suite.add_argument('--densities', nargs='+', type=float, default=[0.15, 0.25])
+    suite.add_argument('--grid-seeds', nargs='+', type=int, default=[0])
+    suite.add_argument('--seeds', nargs='+', type=int, default=[0, 1])
+    suite.add_argument('--dictionary', default='words.txt')
+    suite.add_argument('--timeout', type=float, default=10)
+    suite.add_argument('--max-length', type=int, default=12)
+    suite.add_argument('--output', default='bench_results.json')
+    suite.add_argument('--compare', help='baseline results file, exits with 1 on a regression')
+    suite.add_argument('--tolerance', type=float, default=0.1)
+    suite.add_argument('--min-seconds', type=float, default=0.05)
+    scaling = commands.add_parser('scaling', help='work-stealing search against forward checking per worker count')
+    scaling.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4, 8])
+    scaling.add_argument('--sizes', nargs='+', type=int, default=[9, 11, 13])
+    scaling.add_argument('--densities', nargs='+', type=float, default=[0.15, 0.25])
+    scaling.add_argument('--grid-seeds', nargs='+', type=int, default=[0, 1, 2])
+    scaling.add_argument('--seed', type=int, default=0)
+    scaling.add_argument('--dictionary', default='words.txt')
+    scaling.add_argument('--timeout', type=float, default=60)
+    scaling.add_argument('--max-length', type=int, default=12)
+    args = parser.parse_args()
+
+    if args.command == 'suite':
+        suite_results = run_suite(args.engines, args.sizes, args.densities, args.grid_seeds, args.seeds,
+                                  args.dictionary, args.timeout, args.max_length)
+        with open(args.output, 'w') as file:
+            json.dump(suite_results, file, indent=1)
+
+        if args.compare:
+            with open(args.compare) as file:
+                found = compare_results(json.load(file), suite_results, args.tolerance, args.min_seconds)
+            for message in found:
+                print('REGRESSION', message)
+            sys.exit(1 if found else 0)
+
+    elif args.command == 'scaling':
+        run_scaling(args.workers, args.sizes, args.densities, args.grid_seeds, args.seed, args.dictionary,
+                    args.timeout, args.max_length)
+
+    elif args.command == 'ac3':
+        benchmark_arc_consistency("crossword_1.txt", "word_list.txt")
+        benchmark_arc_consistency("crossword_2.txt", "words.txt")
+        benchmark_arc_consistency("crossword_3.txt", "words.txt")
+
+    elif args.command == 'packed':
+        benchmark_packed("crossword_2.txt", "words.txt")
+        benchmark_packed("crossword_3.txt", "words.txt")
+
+    else:
+        benchmark_letter_index("crossword_2.txt", "words.txt")
+        benchmark_letter_index("crossword_3.txt", "words.txt")
@@ -0,0 +1,191 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+# Layout of a compiled dictionary: MAGIC, header size (8 bytes, little endian), JSON header, then the arrays,
+# each starting on an ALIGNMENT boundary. The header lists, for each word length, the word matrix (uint8,
+# one row per word, each word once) and the positional letter index (bool, one row per (position, letter) key).
+MAGIC = b'CWDICT02'
+ALIGNMENT = 64
+
+
+def cache_path_for(dict_path):
+    """
+    Gets the path of the compiled dictionary of a dictionary text file
+    :param dict_path: path to dictionary text file
+    :return: path to compiled dictionary
+    """
+    return dict_path + '.cache'
+
+
+def source_fingerprint(dict_path):
+    """
+    Identifies the version of a dictionary text file
+    :param dict_path: path to dictionary text file
+    :return: dictionary of size and modification time
+    """
+    stat = os.stat(dict_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def parse_dictionary(dict_path):
+    """
+    Parses a dictionary text file into word matrices
+    :param dict_path: path to dictionary text file, one word per line
+    :return: numpy word matrices (ASCII codes) by length, words in file order without repeats
+    """
+    by_length = {}
+
+    with open(dict_path, 'rb') as file:
+        for word in dict.fromkeys(file.read().splitlines()):
+            if word:
+                by_length.setdefault(len(word), []).append(word)
+
+    return {k: np.frombuffer(b''.join(v), dtype=np.uint8).reshape(len(v), k) for k, v in sorted(by_length.items())}
+
+
+def build_letter_index(dictionary):
+    """
+    Builds the positional letter index of a dictionary. For each word length, maps (position, letter) to a
+    bitset (boolean array over the rows of the word matrix) of the words having that letter at that position.
+    :param dictionary: numpy word matrices by length
+    :return: positional letter index by length
+    """
+    letter_index = {}
+
+    for k, v in dictionary.items():
+        index = {}
+        for position in range(k):
+            column = v[:, position]
+            for letter in np.unique(column):
+                index[(position, int(letter))] = column == letter
+        letter_index[k] = index
+
+    return letter_index
+
+
+def align(offset):
+    """
+    Rounds an offset up to the next ALIGNMENT boundary
+    :param offset: offset in bytes
+    :return: aligned offset
+    """
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_compiled(cache_path, dictionary, letter_index, source):
+    """
+    Writes a compiled dictionary. The file is written next to its final path and renamed into place, so
+    concurrent readers and writers never see a partial file.
+    :param cache_path: path to compiled dictionary
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param source: fingerprint of the dictionary text file
+    :return: None
+    """
+    entries = []
+    arrays = []
+    offset = 0
+
+    for k, v in dictionary.items():
+        keys = sorted(letter_index[k])
+        bitsets = np.stack([letter_index[k][key] for key in keys])
+        words_offset = offset
+        index_offset = align(words_offset + v.nbytes)
+        offset = align(index_offset + bitsets.nbytes)
+        entries.append({'length': k, 'count': v.shape[0], 'words': words_offset, 'index': index_offset,
+                        'keys': [list(key) for key in keys]})
+        arrays.append((words_offset, v))
+        arrays.append((index_offset, bitsets))
+
+    header = json.dumps({'source': source, 'entries': entries}).encode()
+    data_start = align(len(MAGIC) + 8 + len(header))
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_path)))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(MAGIC)
+            file.write(len(header).to_bytes(8, 'little'))
+            file.write(header)
+            for array_offset, array in arrays:
+                file.seek(data_start + array_offset)
+                file.write(np.ascontiguousarray(array).tobytes())
+            file.truncate(data_start + offset)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+
+def read_header(cache_path):
+    """
+    Reads the header of a compiled dictionary
+    :param cache_path: path to compiled dictionary
+    :return: (header, offset of the arrays), or None if the file is missing or not a compiled dictionary
+    """
+    try:
+        with open(cache_path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                return None
+            size = int.from_bytes(file.read(8), 'little')
+            header = json.loads(file.read(size))
+    except (OSError, ValueError):
+        return None
+
+    return header, align(len(MAGIC) + 8 + size)
+
+
+def map_compiled(cache_path, header, data_start):
+    """
+    Maps a compiled dictionary into memory. Pages are read on demand and shared by every process mapping
+    the same file.
+    :param cache_path: path to compiled dictionary
+    :param header: header of the compiled dictionary
+    :param data_start: offset of the arrays
+    :return: (read-only numpy word matrices by length, positional letter index by length)
+    """
+    # plain array views of the mapping: slicing a memmap subclass costs more on every word lookup
+    data = np.memmap(cache_path, dtype=np.uint8, mode='r').view(np.ndarray)
+    dictionary = {}
+    letter_index = {}
+
+    for entry in header['entries']:
+        k = entry['length']
+        n = entry['count']
+        words_start = data_start + entry['words']
+        index_start = data_start + entry['index']
+        dictionary[k] = data[words_start:words_start + n * k].reshape(n, k)
+        bitsets = data[index_start:index_start + len(entry['keys']) * n].view(np.bool_).reshape(-1, n)
+        letter_index[k] = {(position, letter): bitsets[i] for i, (position, letter) in enumerate(entry['keys'])}
+
+    return dictionary, letter_index
+
+
+def load_dictionary(dict_path):
+    """
+    Loads a dictionary text file through its compiled dictionary, compiling it first if it is missing or
+    older than the text file. The parsed arrays are returned instead when the compiled dictionary cannot be
+    written or read back.
+    :param dict_path: path to dictionary text file
+    :return: (numpy word matrices by length, positional letter index by length)
+    """
+    cache_path = cache_path_for(dict_path)
+    source = source_fingerprint(dict_path)
+
+    compiled = read_header(cache_path)
+    if compiled is None or compiled[0]['source'] != source:
+        dictionary = parse_dictionary(dict_path)
+        letter_index = build_letter_index(dictionary)
+        try:
+            write_compiled(cache_path, dictionary, letter_index, source)
+        except OSError:
+            return dictionary, letter_index
+        compiled = read_header(cache_path)
+        if compiled is None or compiled[0]['source'] != source:
+            # removed or replaced by another process in between
+            return dictionary, letter_index
+
+    return map_compiled(cache_path, *compiled)
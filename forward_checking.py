@@ -1,9 +1,23 @@
 import numpy as np
 import multiprocessing
 import time
-import copy
-import random
+import io
+import contextlib
+import queue
 import signal
+from collections import deque, OrderedDict
+
+import compiled_dictionary
+import instrumentation
+import packed_words
+import pattern_cache
+import shared_dictionary
+import solution_cache
+import variable_ordering
+
+# type of the word indexes held by the domains, half the size of the default integer and enough for any
+# dictionary that fits in memory
+DOMAIN_DTYPE = np.uint32
 
 
 class Intersection:
@@ -23,6 +37,56 @@ class Word:
         self.id = idN
         self.intersections = []
         self.intersectionsNumber = 0
+        self.words = None
+        self.letterIndex = None
+        self.prunedBy = []
+
+
+class Trail:
+    def __init__(self):
+        self.domains = []
+        self.cells = []
+        # VariableOrdering kept up to date with the domain sizes, created by the search on its first call
+        self.ordering = None
+        # PatternCache narrowing the domains by the letters of their words, None to narrow letter by letter
+        self.patterns = None
+        # PackedDictionary narrowing the domains of up to packed_words.MAX_LENGTH letters, None to use the
+        # word matrices
+        self.packed = None
+        # bitset of the assigned word indexes by length when no word may appear twice, None to allow repeats
+        self.used = None
+        # (length, word index) of the assigned words
+        self.assigned = []
+        # number of times values were removed because their word was already used
+        self.repeats = 0
+        # ChoicePoint of each level of search_solutions, from the root, so that the values not tried yet can
+        # be handed over to another search; None to not keep them
+        self.choices = None
+
+
+class ChoicePoint:
+    def __init__(self, var, values):
+        self.var = var
+        self.values = values
+        # position of the next value to try, and the value being tried
+        self.next = 0
+        self.value = None
+
+    def __iter__(self):
+        while self.next < len(self.values):
+            self.value = self.values[self.next]
+            self.next += 1
+            yield self.value
+
+
+class Nogoods:
+    def __init__(self, max_size, max_cells):
+        self.maxSize = max_size
+        self.maxCells = max_cells
+        self.store = OrderedDict()
+        self.byCell = {}
+        self.learned = 0
+        self.hits = 0
 
 
 def load_crossword(crossword):
@@ -31,195 +95,275 @@ def load_crossword(crossword):
     :param crossword: File name
     :return: numpy matrix containing crossword puzzle
     """
+    with open(crossword, 'r') as file:
+        return parse_crossword(file)
+
+
+def parse_crossword(lines):
+    """
+    Parses the rows of a crossword puzzle into numpy matrix.
+    :param lines: rows of the puzzle, '0' for an open cell and '#' for a block
+    :return: numpy matrix containing crossword puzzle
+    """
     table = []
 
-    with open(crossword, 'r') as file:
-        for line in file:
-            line = line.strip()
-            row = [int(cell) if cell != '#' else 35 for cell in line]
-            table.append(row)
+    for line in lines:
+        line = line.strip()
+        row = [int(cell) if cell != '#' else 35 for cell in line]
+        table.append(row)
 
     np_matrix = np.array(table, dtype=np.uint8)
     return np_matrix
 
 
-def vert_id_by_coord(coord, vertical_words):
+def find_runs(open_cells):
     """
-    Gets the ID of vertical word from given coordinates
-    :param coord: coordinates
-    :param vertical_words: vertical words
-    :return: Id of vertical word or -1 if word is not found
+    Finds the runs of two or more open cells along the rows of a grid
+    :param open_cells: boolean matrix, True for open cells
+    :return: (rows, starting columns, lengths) of the runs, in row-major order
     """
-    for word in vertical_words:
-        if word.pos[1] == coord[1]:
-            if word.pos[0] <= coord[0] <= word.pos[0] + word.length:
-                return word.id
-    return -1
+    padded = np.zeros((open_cells.shape[0], open_cells.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = open_cells
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    lengths = ends - starts
+    long_runs = lengths > 1
+    return rows[long_runs], starts[long_runs], lengths[long_runs]
 
 
-def hor_id_by_coord(coord, horizontal_words):
+def run_cells(rows, starts, lengths):
     """
-    Gets the ID of horizontal word from given coordinates
-    :param coord: coordinates
-    :param horizontal_words: horizontal words
-    :return: ID of a horizontal word or -1 if word is not found
+    Lists the cells of runs
+    :param rows: rows of the runs
+    :param starts: starting columns of the runs
+    :param lengths: lengths of the runs
+    :return: (run numbers, rows, columns) of every cell of the runs
     """
-    for word in horizontal_words:
-        if word.pos[0] == coord[0]:
-            if word.pos[1] <= coord[1] <= word.pos[1] + word.length:
-                return word.id
-    return -1
-
-
-def search_hor_vars(np_matrix, id_n):
-    """
-    Searches for horizontal words to fill crossword
-    :param np_matrix: numpy matrix
-    :param id_n: ID
-    :return: list of horizontal words
-    """
-    words = []
-
-    for x in range(0, np_matrix.shape[0]):
-        length = 0
-        for y in range(1, np_matrix.shape[1]):
-            if length == 0:
-                if np_matrix[x][y - 1] != 35 and np_matrix[x][y] != 35:
-                    length = 2
-                    continue
-            if length > 1:
-                if np_matrix[x][y] != 35:
-                    length += 1
-                    continue
-                else:
-                    pos = (x, y - length)
-                    words.append(Word(pos, 1, length, length, id_n))
-                    id_n += 1
-                    length = 0
-
-        if length > 1:
-            pos = (x, np_matrix.shape[1] - length)
-            word = Word(pos, 1, length, length, id_n)
-            id_n += 1
-            words.append(word)
-    return words
-
-
-def search_vert_words(np_matrix, id_n):
-    """
-    Searches for vertical words to fill crossword
-    :param np_matrix: numpy matrix
-    :param id_n: ID
-    :return: vertical words
-    """
-    words = []
-    for y in range(0, np_matrix.shape[1]):
-        length = 0
-        for x in range(1, np_matrix.shape[0]):
-            if length == 0:
-                if np_matrix[x - 1][y] != 35 and np_matrix[x][y] != 35:
-                    length = 2
-                    continue
-
-            if length > 1:
-                if np_matrix[x][y] != 35:
-                    length += 1
-                    continue
-                else:
-                    pos = (x - length, y)
-                    words.append(Word(pos, 0, length, length, id_n))
-                    id_n += 1
-                    length = 0
-        if length > 1:
-            pos = (np_matrix.shape[0] - length, y)
-            word = Word(pos, 0, length, length, id_n)
-            id_n += 1
-            words.append(word)
-    return words
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    run = np.repeat(np.arange(len(lengths)), lengths)
+    return run, rows[run], starts[run] + np.arange(offsets.shape[0]) - offsets
 
 
-def intersections(words, horizontal_words, vert_words, crossword):
+def compile_grid(crossword):
     """
-    Finds the intersections and stores them in an attribute for its corresponding word
-    :param words: given words
-    :param horizontal_words: horizontal words
-    :param vert_words: vertical words
+    Compiles a crossword into its words and crossings. Runs of open cells are found with vectorized numpy
+    operations, horizontal words first (row by row) then vertical words (column by column).
     :param crossword: crossword puzzle
+    :return: (horizontal words, vertical words, slot lookup, crossing table). The slot lookup holds the ID of
+    the horizontal and of the vertical word through each cell (-1 for none), shape (rows, columns, 2). The
+    crossing table holds one row (horizontal ID, index in it, vertical ID, index in it) per crossing cell.
+    """
+    open_cells = crossword != 35
+    slots = np.full(crossword.shape + (2,), -1, dtype=np.int32)
+
+    rows, columns, lengths = find_runs(open_cells)
+    horizontal_words = [Word((x, y), 1, n, n, i)
+                        for i, (x, y, n) in enumerate(zip(rows.tolist(), columns.tolist(), lengths.tolist()))]
+    run, x, y = run_cells(rows, columns, lengths)
+    slots[x, y, 0] = run
+
+    first_id = len(horizontal_words)
+    columns, rows, lengths = find_runs(open_cells.T)
+    vertical_words = [Word((x, y), 0, n, n, first_id + i)
+                      for i, (x, y, n) in enumerate(zip(rows.tolist(), columns.tolist(), lengths.tolist()))]
+    run, y, x = run_cells(columns, rows, lengths)
+    slots[x, y, 1] = run + first_id
+
+    x, y = np.nonzero((slots[:, :, 0] >= 0) & (slots[:, :, 1] >= 0))
+    horizontal_ids = slots[x, y, 0]
+    vertical_ids = slots[x, y, 1]
+    horizontal_starts = np.array([w.pos[1] for w in horizontal_words], dtype=np.int32)
+    vertical_starts = np.array([w.pos[0] for w in vertical_words], dtype=np.int32)
+    crossings = np.stack((horizontal_ids, y - horizontal_starts[horizontal_ids],
+                          vertical_ids, x - vertical_starts[vertical_ids - first_id]), axis=1).astype(np.int32)
+
+    return horizontal_words, vertical_words, slots, crossings
+
+
+def intersections(words, crossings):
+    """
+    Stores the crossings of the crossing table in the intersections attribute of their words
+    :param words: horizontal words followed by vertical words
+    :param crossings: crossing table from compile_grid
     :return: list of intersected words
     """
+    for horizontal_id, horizontal_index, vertical_id, vertical_index in crossings.tolist():
+        horizontal_word = words[horizontal_id]
+        vertical_word = words[vertical_id]
+        coord = (horizontal_word.pos[0], horizontal_word.pos[1] + horizontal_index)
+        horizontal_word.intersections.append(Intersection(coord, horizontal_index, vertical_id))
+        vertical_word.intersections.append(Intersection(coord, vertical_index, horizontal_id))
+
     for w in words:
-        if w.horizontal == 1:
-            y_start = w.pos[1]
-            y_end = y_start + w.length - 1
-            for y in range(y_start, y_end + 1):
-                if w.pos[0] > 0:
-                    if crossword[w.pos[0] - 1][y] == 0:
-                        index = y - w.pos[1]
-                        intersected_id = vert_id_by_coord((w.pos[0], y), vert_words)
-                        w.intersections.append(Intersection((w.pos[0], y), index, intersected_id))
-                        continue
-                if w.pos[0] < crossword.shape[0] - 1:
-                    if crossword[w.pos[0] + 1][y] == 0:
-                        index = y - w.pos[1]
-                        intersected_id = vert_id_by_coord((w.pos[0], y), vert_words)
-                        w.intersections.append(Intersection((w.pos[0], y), index, intersected_id))
-        else:
-            x_start = w.pos[0]
-            x_end = x_start + w.length - 1
-            for x in range(x_start, x_end + 1):
-                if w.pos[1] > 0:
-                    if crossword[x][w.pos[1] - 1] == 0:
-                        index = x - w.pos[0]
-                        intersected_id = hor_id_by_coord((x, w.pos[1]), horizontal_words)
-                        w.intersections.append(Intersection((x, w.pos[1]), index, intersected_id))
-                        continue
-                if w.pos[1] < crossword.shape[1] - 1:
-                    if crossword[x][w.pos[1] + 1] == 0:
-                        index = x - w.pos[0]
-                        intersected_id = hor_id_by_coord((x, w.pos[1]), horizontal_words)
-                        w.intersections.append(Intersection((x, w.pos[1]), index, intersected_id))
         w.intersectionsNumber = len(w.intersections)
 
     return words
 
 
+def create_words(crossword, stats=None):
+    """
+    Finds the words of a crossword and their intersections
+    :param crossword: crossword puzzle
+    :param stats: Instrumentation timing the phases, or None
+    :return: horizontal words followed by vertical words
+    """
+    with instrumentation.phase(stats, 'slot extraction'):
+        horizontal_words, vertical_words, _, crossings = compile_grid(crossword)
+    with instrumentation.phase(stats, 'intersections'):
+        return intersections(horizontal_words + vertical_words, crossings)
+
+
 def fill_dict(dict_path):
     """
-    Gets words from the dictionary path
+    Gets words from the dictionary path, through its compiled and memory-mapped form
     :param dict_path: path to dictionary text file
-    :return:
+    :return: numpy word matrices by length and their positional letter index
+    """
+    return compiled_dictionary.load_dictionary(dict_path)
+
+
+def letter_mask(domain_ids, letter_index, position, letter):
+    """
+    Finds the words of a domain having the given letter at the given position
+    :param domain_ids: indexes of the words in the domain
+    :param letter_index: positional letter index for the length of the domain
+    :param position: position of the letter in the word
+    :param letter: ASCII code of the letter
+    :return: boolean mask over domain_ids
     """
+    bitset = letter_index.get((position, int(letter)))
+    if bitset is None:
+        return np.zeros(domain_ids.shape[0], dtype=bool)
+    # take gathers uint32 indexes without the conversion to intp of fancy indexing
+    return bitset.take(domain_ids)
+
 
-    dictionary = {}
+def narrow_domain(domain_ids, letter_index, position, letter):
+    """
+    Keeps the words of a domain having the given letter at the given position
+    :param domain_ids: indexes of the words in the domain
+    :param letter_index: positional letter index for the length of the domain
+    :param position: position of the letter in the word
+    :param letter: ASCII code of the letter
+    :return: narrowed domain indexes, in the same order
+    """
+    return domain_ids.compress(letter_mask(domain_ids, letter_index, position, letter))
 
-    for line in open(dict_path, encoding="Windows-1252"):
-        word = line[:-1]
-        size = len(word)
-        byte_arr = bytearray(word, 'Windows-1252')
-        ascii_word = list(byte_arr)
 
-        if size in dictionary:
-            dictionary[size].append(ascii_word)
-        else:
-            dictionary[size] = [ascii_word]
+def word_pattern(word, crossword):
+    """
+    Gets the letters written in the cells of a word
+    :param word: word
+    :param crossword: crossword puzzle
+    :return: pattern bytes, 0 for an empty cell
+    """
+    x, y = word.pos
+    if word.horizontal == 1:
+        return crossword[x, y:y + word.length].tobytes()
+    return crossword[x:x + word.length, y].tobytes()
 
-    # Transforming list into numpy array
-    for k, v in dictionary.items():
-        random.shuffle(v)
-        numpy_arr = np.array(v, dtype=np.uint8)
-        dictionary[k] = numpy_arr
 
-    return dictionary
+def domain_ids(var, d):
+    """
+    Gets the indexes of the words remaining in the domain of a variable. The domain array of a variable is
+    a permutation of its candidates whose first remainingValues entries are the current domain.
+    :param var: variable
+    :param d: domain
+    :return: view of the remaining word indexes
+    """
+    return d[var.id][:var.remainingValues]
 
 
-def domain(var, d):
+def narrow_in_place(var, d, mask, trail):
     """
-    Gets the domain of a variable
+    Narrows the domain of a variable in place, moving the kept words to the front of its domain array.
+    The previous size is pushed on the trail so that undo can restore it. Without a trail the narrowing is
+    permanent and the domain array is truncated.
     :param var: variable
     :param d: domain
-    :return: domain of given variable
+    :param mask: boolean mask over the remaining word indexes, True for the words to keep
+    :param trail: Trail or None
+    :return: number of remaining values
     """
-    return d[var.id]
+    size = var.remainingValues
+    kept = int(np.count_nonzero(mask))
+    if kept == size:
+        return kept
+
+    values = domain_ids(var, d)
+    if trail is None:
+        d[var.id] = values[mask]
+    else:
+        trail.domains.append((var, size))
+        values[:] = np.concatenate((values[mask], values[~mask]))
+    var.remainingValues = kept
+    if trail is not None and trail.ordering is not None:
+        variable_ordering.update_variable(trail.ordering, var)
+    return kept
+
+
+def store_word_on_trail(word, crossword, trail):
+    """
+    Writes a word to the crossword, pushing the overwritten cells on the trail
+    :param word: word to write
+    :param crossword: crossword puzzle, updated in place
+    :param trail: Trail
+    :return: None
+    """
+    x, y = word.pos
+    for index in range(word.length):
+        if word.horizontal == 1:
+            cell = (x, y + index)
+        else:
+            cell = (x + index, y)
+        if crossword[cell] != word.letters[index]:
+            trail.cells.append((cell, crossword[cell]))
+            crossword[cell] = word.letters[index]
+
+
+def use_word(var, value_id, trail):
+    """
+    Marks the word assigned to a variable as used, when the trail forbids repeated words
+    :param var: variable
+    :param value_id: index of its word in the word matrix
+    :param trail: Trail
+    :return: None
+    """
+    if trail.used is not None:
+        trail.used[var.length][value_id] = True
+        trail.assigned.append((var.length, value_id))
+
+
+def trail_mark(trail):
+    """
+    Marks the current position of the trail
+    :param trail: Trail
+    :return: mark to undo to
+    """
+    return len(trail.domains), len(trail.cells), len(trail.assigned)
+
+
+def undo(trail, mark, crossword):
+    """
+    Restores the domain sizes, crossword cells and used words changed since a mark of the trail
+    :param trail: Trail
+    :param mark: mark from trail_mark
+    :param crossword: crossword puzzle, updated in place
+    :return: None
+    """
+    domains_mark, cells_mark, assigned_mark = mark
+    while len(trail.domains) > domains_mark:
+        var, size = trail.domains.pop()
+        var.remainingValues = size
+        if trail.ordering is not None:
+            variable_ordering.update_variable(trail.ordering, var)
+    while len(trail.cells) > cells_mark:
+        cell, value = trail.cells.pop()
+        crossword[cell] = value
+    while len(trail.assigned) > assigned_mark:
+        length, value_id = trail.assigned.pop()
+        trail.used[length][value_id] = False
 
 
 def store_to_crossword(lva, crossword):
@@ -244,27 +388,6 @@ def store_to_crossword(lva, crossword):
     return crossword
 
 
-def store_word_to_crossword(word, crossword):
-    """
-    Writes a word to the crossword
-    :param word: word to write
-    :param crossword: base crossword puzzle
-    :return: updated crossword puzzle
-    """
-    index = 0
-    if word.horizontal == 1:
-        x = word.pos[0]
-        for y in range(word.pos[1], word.pos[1] + word.length):
-            crossword[x][y] = word.letters[index]
-            index += 1
-    else:
-        y = word.pos[1]
-        for x in range(word.pos[0], word.pos[0] + word.length):
-            crossword[x][y] = word.letters[index]
-            index += 1
-    return crossword
-
-
 def print_crossword(crossword):
     """
     Formats and prints crossword
@@ -275,15 +398,17 @@ def print_crossword(crossword):
                               for item in row]) for row in crossword]))
 
 
-def pass_restrictions(var, word, lva, r):
+def pass_restrictions(var, word, lva, r, stats=None):
     """
     Validates restrictions from other variables
     :param var: variable
     :param word: words
     :param lva: LVA
     :param r:
+    :param stats: Instrumentation counting the checks, or None
     :return: Boolean
     """
+    instrumentation.count(stats, 'checks')
     intersections_1 = var.intersections
 
     for i in intersections_1:
@@ -319,7 +444,7 @@ def insert_lva(lva, var, crossword):
     return lva
 
 
-def backtracking(lva, lvna, d, r, crossword):
+def backtracking(lva, lvna, d, r, crossword, all_different=False):
     """
     Implements backtracking algorithm
     :param lva: LVA values
@@ -327,6 +452,7 @@ def backtracking(lva, lvna, d, r, crossword):
     :param d: domain
     :param r: r
     :param crossword: crossword
+    :param all_different: skip the words already assigned
     :return:
     """
 
@@ -334,14 +460,18 @@ def backtracking(lva, lvna, d, r, crossword):
         return lva, 1
 
     var = lvna[0]
+    used = {tuple(w.letters) for w in lva.values() if w.length == var.length} if all_different else ()
+
+    for value_id in domain_ids(var, d):
+        cWord = var.words[value_id]
 
-    domain_values = domain(var, d)
-    for cWord in domain_values:
+        if used and tuple(cWord.tolist()) in used:
+            continue
 
         if pass_restrictions(var, cWord, lva, 0):
 
             lva = insert_lva(lva, var, cWord)
-            lva, r = backtracking(lva, lvna[1:], d, r, crossword)
+            lva, r = backtracking(lva, lvna[1:], d, r, crossword, all_different)
             if r == 1:
                 return lva, r
 
@@ -351,206 +481,1680 @@ def backtracking(lva, lvna, d, r, crossword):
     return lva, 0
 
 
-def update_domains(var, lvna, cr, d):
+def record_wipeout(word, intersected_word, trail, stats):
     """
-    Updates all domains for variables
+    Records a domain wiped out through the crossing of two words
+    :param word: word whose domain was wiped out
+    :param intersected_word: crossed word that caused it
+    :param trail: Trail of the search, or None
+    :param stats: Instrumentation counting the wipeouts, or None
+    :return: None
+    """
+    instrumentation.count_wipeout(stats, word)
+    if trail is not None and trail.ordering is not None:
+        variable_ordering.bump_weight(trail.ordering, word, intersected_word)
+
+
+def update_domains(var, lvna, cr, d, trail=None, stats=None):
+    """
+    Updates in place the domains of the variables crossing var
     :param var:
-    :param lvna:
+    :param lvna: not assigned variables, as a list or by ID
     :param cr:
     :param d:
-    :return:
+    :param trail: Trail recording the narrowed domains
+    :param stats: Instrumentation counting the wipeouts, or None
+    :return: False if a domain was wiped out
     """
-    validate_domain = True
-    temp = copy.copy(d)
-
-    dictionary_id = {}
-    for i, vna in enumerate(lvna):
-        dictionary_id[vna.id] = i
+    dictionary_id = lvna if isinstance(lvna, dict) else {vna.id: vna for vna in lvna}
 
     for inter in var.intersections:
         if inter.intersectedID not in dictionary_id:
             continue
 
-        intersected_word_index = dictionary_id[inter.intersectedID]
-
-        word_intersected = lvna[intersected_word_index]
-        temp_domain = temp[word_intersected.id]
+        word_intersected = dictionary_id[inter.intersectedID]
 
         x = inter.coord[0]
         y = inter.coord[1]
 
-        index_inter = 0
-        for intersected in word_intersected.intersections:
-            if intersected.intersectedID == var.id:
-                index_inter = intersected.index
+        index_inter = crossing_index(word_intersected, var.id)
 
         existing_value = cr[x][y]
-        if existing_value > 64:  # is a letter
-            sub_index = np.where(temp_domain[:, index_inter] == existing_value)
-            temp_domain = temp_domain[sub_index]
-            if temp_domain.shape[0] == 0:
-                validate_domain = False
-                break
+        if existing_value != 0:  # is written, whatever its character
+            if trail is not None and trail.patterns is not None:
+                matches = pattern_cache.pattern_mask(trail.patterns, word_intersected.length,
+                                                     word_pattern(word_intersected, cr))
+                mask = matches[domain_ids(word_intersected, d)]
+            elif trail is not None and trail.packed is not None and word_intersected.length in trail.packed.words:
+                query = packed_words.letter_query(trail.packed, index_inter, existing_value)
+                mask = packed_words.match_ids(trail.packed, word_intersected.length,
+                                              domain_ids(word_intersected, d), query)
+            else:
+                mask = letter_mask(domain_ids(word_intersected, d), word_intersected.letterIndex, index_inter,
+                                   existing_value)
+            kept = narrow_in_place(word_intersected, d, mask, trail)
+            if kept and trail is not None and trail.used is not None:
+                # checked once the crossing letter has narrowed the domain, as fewer words are left then
+                repeated = trail.used[word_intersected.length][domain_ids(word_intersected, d)]
+                if repeated.any():
+                    trail.repeats += 1
+                    kept = narrow_in_place(word_intersected, d, ~repeated, trail)
+            if kept == 0:
+                record_wipeout(word_intersected, var, trail, stats)
+                return False
 
-        temp[word_intersected.id] = temp_domain
-        lvna[intersected_word_index].remainingValues = temp_domain.shape[0]
+    return True
 
-    if not validate_domain:
-        return None
+
+def crossing_index(word, intersected_id):
+    """
+    Gets the position in a word of its crossing with another word
+    :param word: word
+    :param intersected_id: ID of the crossed word
+    :return: index of the crossing in word, or -1 if the words do not cross
+    """
+    for inter in word.intersections:
+        if inter.intersectedID == intersected_id:
+            return inter.index
+    return -1
+
+
+def revise(word, index, intersected_word, intersected_index, d, supports, trail=None):
+    """
+    Removes the values of a word having no support in the domain of a crossed word
+    :param word: word to revise
+    :param index: index of the crossing in word
+    :param intersected_word: crossed word
+    :param intersected_index: index of the crossing in the crossed word
+    :param d: domains, updated in place
+    :param supports: cache of letters supported by (word ID, index), updated in place
+    :param trail: Trail recording the narrowed domains
+    :return: True if the domain of word was narrowed
+    """
+    key = (intersected_word.id, intersected_index)
+    support = supports.get(key)
+    if support is None:
+        support = np.zeros(256, dtype=bool)
+        support[intersected_word.words[domain_ids(intersected_word, d), intersected_index]] = True
+        supports[key] = support
+
+    size = word.remainingValues
+    if narrow_in_place(word, d, support[word.words[domain_ids(word, d), index]], trail) == size:
+        return False
+
+    for k in [k for k in supports if k[0] == word.id]:
+        del supports[k]
+    return True
+
+
+def arc_consistency(lvna, d, changed=None, trail=None, stats=None):
+    """
+    Makes the domains of the not assigned variables arc consistent (AC-3). Letter supports of a domain are
+    cached until the domain is narrowed.
+    :param lvna: not assigned variables, as a list or by ID
+    :param d: domains, updated in place
+    :param changed: IDs of the variables whose domains changed, None to check every arc
+    :param trail: Trail recording the narrowed domains, None to narrow permanently
+    :param stats: Instrumentation counting the wipeouts, or None
+    :return: False if a domain was wiped out
+    """
+    unassigned = lvna if isinstance(lvna, dict) else {w.id: w for w in lvna}
+
+    queue = deque()
+    if changed is None:
+        for w in unassigned.values():
+            for inter in w.intersections:
+                if inter.intersectedID in unassigned:
+                    queue.append((w.id, inter.intersectedID))
     else:
-        return temp
+        for changed_id in changed:
+            if changed_id not in unassigned:
+                continue
+            for inter in unassigned[changed_id].intersections:
+                if inter.intersectedID in unassigned:
+                    queue.append((inter.intersectedID, changed_id))
+    pending = set(queue)
+    supports = {}
+
+    while queue:
+        arc = queue.popleft()
+        pending.discard(arc)
+        word = unassigned[arc[0]]
+        intersected_word = unassigned[arc[1]]
+
+        index = crossing_index(word, intersected_word.id)
+        intersected_index = crossing_index(intersected_word, word.id)
+        if not revise(word, index, intersected_word, intersected_index, d, supports, trail):
+            continue
+        if word.remainingValues == 0:
+            record_wipeout(word, intersected_word, trail, stats)
+            return False
+
+        for inter in word.intersections:
+            neighbour_arc = (inter.intersectedID, word.id)
+            if inter.intersectedID in unassigned and inter.intersectedID != intersected_word.id \
+                    and neighbour_arc not in pending:
+                queue.append(neighbour_arc)
+                pending.add(neighbour_arc)
+
+    return True
+
+
+def least_constraining_values(var, d, unassigned):
+    """
+    Orders the values of a word by the options they leave to the not assigned crossed words. A value scores
+    the sum over its crossings of the log of the number of words of the crossed domain with the same letter
+    at the crossing, so values wiping out a crossed domain come last.
+    :param var: word to assign
+    :param d: domains
+    :param unassigned: not assigned words by ID
+    :return: remaining word indexes of var, best first (ties keep the domain order)
+    """
+    values = domain_ids(var, d)
+    score = np.zeros(values.shape[0])
+
+    for inter in var.intersections:
+        intersected_word = unassigned.get(inter.intersectedID)
+        if intersected_word is None:
+            continue
+        index = crossing_index(intersected_word, var.id)
+        counts = np.bincount(intersected_word.words[domain_ids(intersected_word, d), index], minlength=256)
+        with np.errstate(divide='ignore'):
+            score += np.log(counts)[var.words[values, inter.index]]
+
+    return values[np.argsort(-score, kind='stable')]
 
 
-def backtracking_forward_checking(lva, lvna, d, r, crossword_restrictions):
+def candidate_values(var, d, trail):
     """
-    Implements backtracking algorithm with forward checking
+    Gets the values of a word in the order the search tries them, leaving out the words already used when the
+    trail forbids repeated words. When the trail keeps choice points, the values are opened as a ChoicePoint
+    pushed on trail.choices, which the caller pops once they are tried.
+    :param var: word to assign
+    :param d: domains
+    :param trail: Trail of the search, with its VariableOrdering
+    :return: remaining word indexes of var, as an iterable
+    """
+    if trail.ordering.lcv:
+        values = least_constraining_values(var, d, trail.ordering.unassigned)
+    else:
+        values = domain_ids(var, d)
+
+    if trail.choices is not None:
+        values = ChoicePoint(var, values)
+        trail.choices.append(values)
+
+    if trail.used is None:
+        return values
+    return unused_values(values, trail.used[var.length], trail)
+
+
+def unused_values(values, used, trail):
+    """
+    Yields the values whose word is not used yet, checked one at a time as the search tries them
+    :param values: word indexes
+    :param used: bitset of the used word indexes of their length
+    :param trail: Trail counting the left out values
+    :return: generator of word indexes
+    """
+    for value_id in values:
+        if used[value_id]:
+            trail.repeats += 1
+            continue
+        yield value_id
+
+
+def create_trail(words, ordering='mrv', lcv=False, patterns=None, all_different=True, packed=None):
+    """
+    Creates the trail of a search over the given not assigned words
+    :param words: not assigned words, with their domains created
+    :param ordering: variable ordering strategy, see variable_ordering.create_ordering
+    :param lcv: try the values by least constraining value
+    :param patterns: PatternCache of the dictionary narrowing the domains, None to narrow letter by letter
+    :param all_different: forbid the same word in two slots
+    :param packed: PackedDictionary of the dictionary narrowing the domains, None to use the word matrices
+    :return: Trail
+    """
+    trail = Trail()
+    trail.ordering = variable_ordering.create_ordering(words, ordering, lcv=lcv)
+    trail.patterns = patterns
+    trail.packed = packed
+    if all_different:
+        trail.used = {w.length: np.zeros(w.words.shape[0], dtype=bool) for w in words}
+    return trail
+
+
+def search_ordering(lvna, trail):
+    """
+    Gets the variable ordering of a search, creating an MRV ordering over lvna on the first call if the trail
+    has none
+    :param lvna: not assigned variables
+    :param trail: Trail of the search
+    :return: VariableOrdering
+    """
+    if trail.ordering is None:
+        trail.ordering = variable_ordering.create_ordering(list(lvna))
+    return trail.ordering
+
+
+def backtracking_forward_checking(lva, lvna, d, r, crossword_restrictions, ac3=False, stats=None, trail=None):
+    """
+    Implements backtracking algorithm with forward checking. Domains and crossword are updated in place and
+    restored from the trail on backtrack.
     :param lva:
     :param lvna:
     :param d:
     :param r:
     :param crossword_restrictions:
+    :param ac3: propagate arc consistency after each assignment
+    :param stats: Instrumentation, or None to disable
+    :param trail: Trail shared by the whole search, created on the first call. Its ordering picks the
+    variables, MRV by default.
     :return:
     """
+    instrumentation.enter_node(stats, len(lva))
+
     if not lvna:
         print_crossword(crossword_restrictions)
         return lva, 1
 
-    lvna.sort(key=lambda x: x.remainingValues)
+    if trail is None:
+        trail = Trail()
+    ordering = search_ordering(lvna, trail)
 
-    var = lvna[0]
-
-    domain_values = domain(var, d)
+    var = variable_ordering.pop_variable(ordering)
+    unassigned = ordering.unassigned
 
-    for cWord in domain_values:
-        if not pass_restrictions(var, cWord, lva, 0):
+    for value_id in candidate_values(var, d, trail):
+        cWord = var.words[value_id]
+        if not pass_restrictions(var, cWord, lva, 0, stats):
             continue
 
         var.letters = cWord.tolist()
-        crossword_restrictions_backup = copy.copy(crossword_restrictions)
-        crossword_restrictions = store_word_to_crossword(var, crossword_restrictions)
+        mark = trail_mark(trail)
+        store_word_on_trail(var, crossword_restrictions, trail)
+        use_word(var, value_id, trail)
+
+        consistent = update_domains(var, unassigned, crossword_restrictions, d, trail, stats)
 
-        update_domains_result = update_domains(var, lvna, crossword_restrictions, d)
+        if consistent and ac3:
+            changed = {inter.intersectedID for inter in var.intersections}
+            consistent = arc_consistency(unassigned, d, changed, trail, stats)
 
-        if update_domains_result is None:
+        if not consistent:
             var.letters = [0] * var.length
-            crossword_restrictions = crossword_restrictions_backup
+            undo(trail, mark, crossword_restrictions)
+            instrumentation.count(stats, 'backtracks')
             continue
 
         lva = insert_lva(lva, var, cWord)
-        lva, r = backtracking_forward_checking(lva, lvna[1:], update_domains_result, r, crossword_restrictions)
+        lva, r = backtracking_forward_checking(lva, unassigned, d, r, crossword_restrictions, ac3, stats, trail)
         if r == 1:
             return lva, r
+        undo(trail, mark, crossword_restrictions)
+        instrumentation.count(stats, 'backtracks')
 
     if r == 0 and var.id in lva:
         lva.pop(var.id)
 
+    variable_ordering.push_variable(ordering, var)
     return lva, 0
 
 
-def create_domains(dict, words):
+def search_solutions(lvna, d, crossword_restrictions, ac3=False, stats=None, trail=None, depth=0):
+    """
+    Yields the solutions of the forward checking search tree one at a time. The search is suspended at each
+    solution with its domains, crossword and trail intact, so the next solution only costs the extra search.
+    :param lvna: not assigned variables
+    :param d: domains, updated in place
+    :param crossword_restrictions: crossword, updated in place
+    :param ac3: propagate arc consistency after each assignment
+    :param stats: Instrumentation, or None to disable
+    :param trail: Trail shared by the whole search, created on the first call. Its ordering picks the
+    variables, MRV by default.
+    :param depth: number of assigned variables
+    :return: iterator of solved crosswords (copies)
+    """
+    instrumentation.enter_node(stats, depth)
+
+    if not lvna:
+        yield crossword_restrictions.copy()
+        return
+
+    if trail is None:
+        trail = Trail()
+    ordering = search_ordering(lvna, trail)
+
+    var = variable_ordering.pop_variable(ordering)
+    unassigned = ordering.unassigned
+
+    for value_id in candidate_values(var, d, trail):
+        var.letters = var.words[value_id].tolist()
+        mark = trail_mark(trail)
+        store_word_on_trail(var, crossword_restrictions, trail)
+        use_word(var, value_id, trail)
+
+        consistent = update_domains(var, unassigned, crossword_restrictions, d, trail, stats)
+
+        if consistent and ac3:
+            changed = {inter.intersectedID for inter in var.intersections}
+            consistent = arc_consistency(unassigned, d, changed, trail, stats)
+
+        if consistent:
+            yield from search_solutions(unassigned, d, crossword_restrictions, ac3, stats, trail, depth + 1)
+        undo(trail, mark, crossword_restrictions)
+        instrumentation.count(stats, 'backtracks')
+
+    if trail.choices is not None:
+        trail.choices.pop()
+    var.letters = [0] * var.length
+    variable_ordering.push_variable(ordering, var)
+
+
+def connected_components(words):
+    """
+    Splits words into the connected components of their crossing graph
+    :param words: words
+    :return: list of components, each a list of words in the order of words
+    """
+    by_id = {w.id: w for w in words}
+    component_of = {}
+    components = []
+
+    for w in words:
+        if w.id in component_of:
+            continue
+        component_of[w.id] = len(components)
+        stack = [w]
+        while stack:
+            word = stack.pop()
+            for inter in word.intersections:
+                if inter.intersectedID in by_id and inter.intersectedID not in component_of:
+                    component_of[inter.intersectedID] = len(components)
+                    stack.append(by_id[inter.intersectedID])
+        components.append([])
+
+    for w in words:
+        components[component_of[w.id]].append(w)
+    return components
+
+
+def split_components(var, unassigned):
+    """
+    Finds the components the not assigned words split into once var is assigned, if any. The not assigned
+    words and var are assumed to be connected, so every new component holds a not assigned word crossing var.
+    :param var: word just assigned
+    :param unassigned: not assigned words by ID
+    :return: list of components (lists of words), or None if the not assigned words are still connected
+    """
+    neighbours = list({inter.intersectedID for inter in var.intersections if inter.intersectedID in unassigned})
+    if len(neighbours) < 2:
+        return None
+
+    components = []
+    reached = set()
+    for start in neighbours:
+        if start in reached:
+            continue
+        reached.add(start)
+        component = []
+        stack = [unassigned[start]]
+        while stack:
+            word = stack.pop()
+            component.append(word)
+            for inter in word.intersections:
+                if inter.intersectedID in unassigned and inter.intersectedID not in reached:
+                    reached.add(inter.intersectedID)
+                    stack.append(unassigned[inter.intersectedID])
+        if not components and all(n in reached for n in neighbours):
+            return None
+        components.append(component)
+
+    return components
+
+
+def solve_component(words, d, crossword_restrictions, ac3=False, stats=None, trail=None, depth=0, split=True):
+    """
+    Solves a connected component of the not assigned words with its own variable ordering
+    :param words: words of the component
+    :param d: domains, updated in place
+    :param crossword_restrictions: crossword, updated in place
+    :param ac3: propagate arc consistency after each assignment
+    :param stats: Instrumentation, or None to disable
+    :param trail: Trail of the search, whose ordering gives the strategy and crossing weights
+    :param depth: number of assigned variables
+    :param split: split the component further as words get assigned, False to search words as a whole (they
+    need not be connected then)
+    :return: True if solved, the crossword then holding the component solution
+    """
+    parent = trail.ordering
+    trail.ordering = variable_ordering.create_ordering(words, parent.strategy, parent.weights, parent.lcv)
+    try:
+        return backtracking_decomposed(trail.ordering.unassigned, d, crossword_restrictions, ac3, stats, trail,
+                                       depth, split)
+    finally:
+        trail.ordering = parent
+
+
+def solve_components(components, d, crossword_restrictions, ac3=False, stats=None, trail=None, depth=0):
+    """
+    Solves components of the not assigned words one after the other, the one holding the best variable of
+    the trail ordering first. When repeated words are forbidden, a component failing after words were left
+    out for being used may have failed on the words chosen by the components before it: the components are
+    then searched again as a whole.
+    :param components: lists of words
+    :param d: domains, updated in place
+    :param crossword_restrictions: crossword, updated in place
+    :param ac3: propagate arc consistency after each assignment
+    :param stats: Instrumentation, or None to disable
+    :param trail: Trail of the search
+    :param depth: number of assigned variables
+    :return: True if solved, the crossword then holding the solution of every component
+    """
+    keys = trail.ordering.keys
+    components = sorted(components, key=lambda c: min(keys[w.id] for w in c))
+    mark = trail_mark(trail)
+
+    for i, component in enumerate(components):
+        repeats = trail.repeats
+        if solve_component(component, d, crossword_restrictions, ac3, stats, trail, depth):
+            continue
+        if i == 0 or trail.repeats == repeats:
+            return False
+        undo(trail, mark, crossword_restrictions)
+        return solve_component([w for c in components for w in c], d, crossword_restrictions, ac3, stats, trail,
+                               depth, False)
+
+    return True
+
+
+def backtracking_decomposed(lvna, d, crossword_restrictions, ac3=False, stats=None, trail=None, depth=0,
+                            split=True):
+    """
+    Implements backtracking algorithm with forward checking, solving separately the components the not
+    assigned words split into after an assignment. Components share no crossing once their neighbours are
+    assigned, so the first solution of each is kept and a failing component fails the assignment without
+    searching the other components again (see solve_components for repeated words). Domains and crossword
+    are updated in place, restored from the trail on backtrack and left holding the solution.
+    :param lvna: connected not assigned variables
+    :param d: domains, updated in place
+    :param crossword_restrictions: crossword, updated in place
+    :param ac3: propagate arc consistency after each assignment
+    :param stats: Instrumentation, or None to disable
+    :param trail: Trail shared by the whole search, created on the first call. Its ordering picks the
+    variables, MRV by default.
+    :param depth: number of assigned variables
+    :param split: split the not assigned variables into components, False to search them as a whole (they
+    need not be connected then)
+    :return: True if solved
+    """
+    instrumentation.enter_node(stats, depth)
+
+    if not lvna:
+        return True
+
+    if trail is None:
+        trail = Trail()
+    ordering = search_ordering(lvna, trail)
+
+    var = variable_ordering.pop_variable(ordering)
+    unassigned = ordering.unassigned
+
+    for value_id in candidate_values(var, d, trail):
+        var.letters = var.words[value_id].tolist()
+        mark = trail_mark(trail)
+        store_word_on_trail(var, crossword_restrictions, trail)
+        use_word(var, value_id, trail)
+
+        consistent = update_domains(var, unassigned, crossword_restrictions, d, trail, stats)
+
+        if consistent and ac3:
+            changed = {inter.intersectedID for inter in var.intersections}
+            consistent = arc_consistency(unassigned, d, changed, trail, stats)
+
+        if consistent:
+            components = split_components(var, unassigned) if split else None
+            if components is None:
+                if backtracking_decomposed(unassigned, d, crossword_restrictions, ac3, stats, trail, depth + 1,
+                                           split):
+                    return True
+            elif solve_components(components, d, crossword_restrictions, ac3, stats, trail, depth + 1):
+                return True
+        undo(trail, mark, crossword_restrictions)
+        instrumentation.count(stats, 'backtracks')
+
+    var.letters = [0] * var.length
+    variable_ordering.push_variable(ordering, var)
+    return False
+
+
+def word_cells(word):
+    """
+    Lists the cells of a word
+    :param word: word
+    :return: list of (x, y) cells
+    """
+    x, y = word.pos
+    if word.horizontal == 1:
+        return [(x, y + index) for index in range(word.length)]
+    return [(x + index, y) for index in range(word.length)]
+
+
+def cell_words(words):
+    """
+    Maps every cell of the words to the IDs of the words written on it, two for a crossing
+    :param words: words
+    :return: dictionary of cell -> set of word IDs
+    """
+    cells = {}
+    for w in words:
+        for cell in word_cells(w):
+            cells.setdefault(cell, set()).add(w.id)
+    return cells
+
+
+def learn_nogood(nogoods, conflict, cells, crossword, pinned=()):
+    """
+    Stores the letters that the words of a conflict set wrote on crossings with other words. No completion of
+    the other words agrees with these letters, whichever words wrote them. Nogoods over more than maxCells
+    cells are not kept, they rarely match again.
+    :param nogoods: Nogoods, updated in place
+    :param conflict: assigned words of the conflict set by ID
+    :param cells: cells of the words from cell_words
+    :param crossword: crossword puzzle
+    :param pinned: words of the conflict set whose every cell is stored too. With all-different, the other
+    words may not repeat them, and a nogood only holds again where the same words are written.
+    :return: None
+    """
+    items = set()
+    for word in conflict.values():
+        for cell in word_cells(word):
+            if not cells[cell] <= conflict.keys():
+                items.add(cell)
+    for word in pinned:
+        items.update(word_cells(word))
+    if len(items) > nogoods.maxCells:
+        return
+    nogood = frozenset((cell, int(crossword[cell])) for cell in items)
+    if not nogood or len(nogood) > nogoods.maxCells or nogood in nogoods.store:
+        return
+
+    nogoods.store[nogood] = None
+    nogoods.learned += 1
+    for item in nogood:
+        nogoods.byCell.setdefault(item, set()).add(nogood)
+
+    if len(nogoods.store) > nogoods.maxSize:
+        evicted, _ = nogoods.store.popitem(last=False)
+        for item in evicted:
+            nogoods.byCell[item].discard(evicted)
+
+
+def find_nogood(nogoods, var, crossword):
+    """
+    Finds a learned nogood matched by the crossword once var is written
+    :param nogoods: Nogoods
+    :param var: word just written
+    :param crossword: crossword puzzle
+    :return: matched nogood or None
+    """
+    buckets = []
+    for inter in var.intersections:
+        cell = inter.coord
+        bucket = nogoods.byCell.get((cell, int(crossword[cell])))
+        if bucket:
+            buckets.append(bucket)
+    if not buckets:
+        return None
+
+    # the letters on the grid, so that each candidate is checked by one subset test (a nogood on several cells
+    # of var is checked once per cell, which costs less than merging the buckets)
+    rows, columns = np.nonzero(crossword)
+    filled = set(zip(zip(rows.tolist(), columns.tolist()), crossword[rows, columns].tolist()))
+    for bucket in buckets:
+        for nogood in bucket:
+            if nogood <= filled:
+                nogoods.store.move_to_end(nogood)
+                nogoods.hits += 1
+                return nogood
+    return None
+
+
+def same_length_words(lva, length):
+    """
+    Finds the assigned words of a length, whose words a word of that length cannot repeat
+    :param lva: assigned words by ID
+    :param length: length of the words
+    :return: set of word IDs
+    """
+    return {i for i, w in lva.items() if w.length == length}
+
+
+def backtracking_cbj(lva, lvna, d, crossword_restrictions, levels, cells, nogoods=None, stats=None, trail=None):
+    """
+    Implements backtracking algorithm with forward checking and conflict-directed backjumping (FC-CBJ).
+    Each word keeps the IDs of the assigned words that pruned its domain. A dead end returns its conflict set
+    and the search jumps back to the deepest word in it, skipping the unrelated words assigned in between.
+    :param lva:
+    :param lvna:
+    :param d:
+    :param crossword_restrictions:
+    :param levels: depth of each assigned word by ID, updated in place
+    :param cells: cells of the words from cell_words
+    :param nogoods: Nogoods learned from conflict sets, None to disable learning
+    :param stats: Instrumentation, or None to disable
+    :param trail: Trail shared by the whole search, created on the first call. Its ordering picks the
+    variables, MRV by default. When it forbids repeated words, the conflict sets also hold the assigned words
+    of the same length, and the nogoods pin the words of the conflict set that another word could repeat.
+    :return: lva, 1 if solved else 0, conflict set (IDs of assigned words)
+    """
+    instrumentation.enter_node(stats, len(levels))
+
+    if not lvna:
+        print_crossword(crossword_restrictions)
+        return lva, 1, set()
+
+    if trail is None:
+        trail = Trail()
+    ordering = search_ordering(lvna, trail)
+
+    var = variable_ordering.pop_variable(ordering)
+    unassigned = ordering.unassigned
+    conflict = set()
+    levels[var.id] = len(levels)
+
+    for value_id in candidate_values(var, d, trail):
+        cWord = var.words[value_id]
+        if not pass_restrictions(var, cWord, lva, 0, stats):
+            continue
+
+        var.letters = cWord.tolist()
+        mark = trail_mark(trail)
+        store_word_on_trail(var, crossword_restrictions, trail)
+        use_word(var, value_id, trail)
+
+        consistent = update_domains(var, unassigned, crossword_restrictions, d, trail, stats)
+        narrowed = [w for w, _ in trail.domains[mark[0]:]]
+        for w in narrowed:
+            w.prunedBy.append(var.id)
+
+        culprits = None
+        if not consistent:
+            culprits = set(narrowed[-1].prunedBy)
+            if trail.used is not None:
+                culprits |= same_length_words(lva, narrowed[-1].length)
+                if var.length == narrowed[-1].length:
+                    culprits.add(var.id)
+        elif nogoods is not None:
+            nogood = find_nogood(nogoods, var, crossword_restrictions)
+            if nogood is not None:
+                culprits = {min((i for i in cells[c] if i in levels), key=levels.get) for c, _ in nogood}
+
+        if culprits is None:
+            lva = insert_lva(lva, var, cWord)
+            lva, r, culprits = backtracking_cbj(lva, unassigned, d, crossword_restrictions, levels, cells, nogoods,
+                                                stats, trail)
+            if r == 1:
+                return lva, r, set()
+
+        for w in narrowed:
+            w.prunedBy.pop()
+        var.letters = [0] * var.length
+        undo(trail, mark, crossword_restrictions)
+        instrumentation.count(stats, 'backtracks')
+
+        if var.id not in culprits:
+            # var played no part in the failure below: jump over it
+            lva.pop(var.id, None)
+            del levels[var.id]
+            variable_ordering.push_variable(ordering, var)
+            return lva, 0, culprits
+        conflict |= culprits - {var.id}
+
+    # var leaves lva first, so that the conflict set only holds assigned words
+    lva.pop(var.id, None)
+    conflict |= set(var.prunedBy)
+    if trail.used is not None:
+        conflict |= same_length_words(lva, var.length)
+    if nogoods is not None:
+        conflict_words = {i: lva[i] for i in conflict}
+        pinned = ()
+        if trail.used is not None:
+            # the letters of a word determine it: writing every cell of the conflict words that another word
+            # could repeat makes the nogood match only where these words are used
+            lengths = {var.length} | {w.length for w in unassigned.values()}
+            lengths |= {w.length for i, w in lva.items() if i not in conflict}
+            pinned = [w for w in conflict_words.values() if w.length in lengths]
+        learn_nogood(nogoods, conflict_words, cells, crossword_restrictions, pinned)
+
+    del levels[var.id]
+    variable_ordering.push_variable(ordering, var)
+    return lva, 0, conflict
+
+
+def create_domains(dict, letter_index, words, rng=None):
     """
-    Creates domains for each variable
+    Creates domains for each variable. A domain holds the indexes (DOMAIN_DTYPE) of its candidate words in
+    the word matrix of its length, in random order. The word matrices are shared by every variable and never
+    copied: narrowing only moves indexes.
     :param dict:
+    :param letter_index: positional letter index from fill_dict
     :param words:
+    :param rng: numpy random generator shuffling the domains, None for an unseeded one
     :return:
     """
+    if rng is None:
+        rng = np.random.default_rng()
     domains = {}
     for w in words:
-        domains[w.id] = dict[w.length]
+        w.words = dict[w.length]
+        w.letterIndex = letter_index[w.length]
+        ids = np.arange(dict[w.length].shape[0], dtype=DOMAIN_DTYPE)
+        rng.shuffle(ids)
+        domains[w.id] = ids
         w.remainingValues = dict[w.length].shape[0]
 
     return domains, words
 
 
-def shuffle_domains(d):
+def luby(i):
     """
-    Shuffles domains
-    :param d:
-    :return:
+    Gets a term of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    :param i: index of the term, from 0
+    :return: term
     """
-    for k, v in d.items():
-        np.random.shuffle(v)
-        d[k] = v
-    return d
+    size, exponent = 1, 0
+    while size < i + 1:
+        exponent += 1
+        size = 2 * size + 1
+
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        exponent -= 1
+        i = i % size
 
+    return 1 << exponent
 
-def handler(signum, frame):
+
+def restart_cutoffs(schedule='luby', base=50, factor=1.5):
     """
-    Exception handler
-    :param signum:
-    :param frame:
-    :return:
+    Yields the budgets of successive restarts
+    :param schedule: 'luby' (base times the Luby sequence) or 'geometric' (base times powers of factor)
+    :param base: budget of the first restart
+    :param factor: growth of the geometric schedule
+    :return: iterator of budgets
     """
-    raise Exception("end of time")
+    if schedule not in ('luby', 'geometric'):
+        raise ValueError(f"unknown restart schedule {schedule!r}")
+
+    i = 0
+    while True:
+        if schedule == 'luby':
+            yield base * luby(i)
+        else:
+            yield int(base * factor ** i)
+        i += 1
 
 
-def long_crossword_signal(words, domains, crossword):
+def restart_search(words, domains, crossword, ac3=False, cbj=False, schedule='luby', base=50, factor=1.5,
+                   measure='nodes', rng=None, stats=None, nogoods=None, ordering='mrv', lcv=False, patterns=None,
+                   all_different=True, packed=None):
     """
-    Handling function using SIGALRM
+    Searches with randomized restarts. Each run is stopped once it has spent its budget of nodes (or
+    backtracks) from the restart schedule, then the crossword and the domains are restored from the trail and
+    the search starts over with a new random order of the words tied on their ordering key and of the values.
+    Nogoods learned by conflict-directed backjumping and the crossing weights of dom/wdeg are kept from one run
+    to the next.
     :param words:
     :param domains:
     :param crossword:
-    :return:
+    :param ac3: propagate arc consistency after each assignment (forward checking only)
+    :param cbj: search with conflict-directed backjumping
+    :param schedule: 'luby' or 'geometric', see restart_cutoffs
+    :param base: budget of the first run
+    :param factor: growth of the geometric schedule
+    :param measure: counter the budgets are measured in, 'nodes' or 'backtracks'
+    :param rng: numpy random generator reordering words and values, None for an unseeded one
+    :param stats: Instrumentation, or None to disable
+    :param nogoods: Nogoods shared by the runs of conflict-directed backjumping, None to disable learning
+    :param ordering: variable ordering strategy, see variable_ordering.create_ordering
+    :param lcv: try the values by least constraining value
+    :param patterns: PatternCache narrowing the domains, None to narrow letter by letter
+    :param all_different: forbid the same word in two slots
+    :param packed: PackedDictionary narrowing the domains, None to use the word matrices
+    :return: lva, 1 if solved else 0
+    """
+    if stats is None:
+        stats = instrumentation.Instrumentation()
+    if rng is None:
+        rng = np.random.default_rng()
+    cells = cell_words(words) if cbj else None
+    trail = create_trail(words, patterns=patterns, all_different=all_different, packed=packed)
+    weights = {}
+
+    for cutoff in restart_cutoffs(schedule, base, factor):
+        # ties on the ordering key are broken by the word list order
+        rng.shuffle(words)
+        for w in words:
+            rng.shuffle(domain_ids(w, domains))
+        trail.ordering = variable_ordering.create_ordering(words, ordering, weights, lcv)
+
+        stats.limit = (measure, getattr(stats, measure) + cutoff)
+        try:
+            if cbj:
+                lva, r, _ = backtracking_cbj({}, list(words), domains, crossword, {}, cells, nogoods, stats, trail)
+            else:
+                lva, r = backtracking_forward_checking({}, list(words), domains, 0, crossword, ac3, stats, trail)
+            return lva, r
+        except instrumentation.SearchCutoff:
+            undo(trail, (0, 0, 0), crossword)
+            for w in words:
+                w.letters = [0] * w.length
+                w.prunedBy = []
+            instrumentation.count(stats, 'restarts')
+        finally:
+            stats.limit = None
+
+
+def prepare_search(crossword, dictionary, letter_index, ac3=False, rng=None):
     """
-    # only works on UNIX
+    Creates the words of a crossword and their domains, pruned by arc consistency when asked
+    :param crossword: crossword puzzle, left unchanged
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param ac3: propagate arc consistency over the domains
+    :param rng: numpy random generator shuffling the domains, None for an unseeded one
+    :return: (words, domains), or None if a word length is not in the dictionary or AC-3 wipes out a domain
+    """
+    words = create_words(crossword)
+    if any(w.length not in dictionary for w in words):
+        return None
+    domains, words = create_domains(dictionary, letter_index, words, rng)
+
+    if ac3 and not arc_consistency(words, domains):
+        return None
+    return words, domains
+
+
+def iter_solutions(crossword, dictionary, letter_index, limit=None, ac3=False, unique=True, rng=None, stats=None,
+                   ordering='mrv', lcv=False, patterns=None, all_different=True, packed=None):
+    """
+    Yields the solutions of a crossword lazily from a single search tree
+    :param crossword: crossword puzzle, left unchanged
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param limit: maximum number of solutions, None for all of them, 0 to search nothing
+    :param ac3: propagate arc consistency before search and after each assignment
+    :param unique: skip solutions identical to one already yielded
+    :param rng: numpy random generator reordering the domains, None for an unseeded order
+    :param stats: Instrumentation, or None to disable
+    :param ordering: variable ordering strategy, see variable_ordering.create_ordering
+    :param lcv: try the values by least constraining value
+    :param patterns: PatternCache of the dictionary narrowing the domains, None to narrow letter by letter
+    :param all_different: forbid the same word in two slots
+    :param packed: PackedDictionary of the dictionary narrowing the domains, None to use the word matrices
+    :return: iterator of solved crosswords
+    :raises ValueError: if limit is negative
+    """
+    if limit is not None and limit < 0:
+        raise ValueError(f"negative solution limit {limit}")
+    if limit == 0:
+        return
+
+    prepared = prepare_search(crossword, dictionary, letter_index, ac3, rng)
+    if prepared is None:
+        return
+    words, domains = prepared
+
+    trail = create_trail(words, ordering, lcv, patterns, all_different, packed)
+
+    seen = set()
+    count = 0
+    for solution in search_solutions(words, domains, crossword.copy(), ac3, stats, trail):
+        if unique:
+            key = solution.tobytes()
+            if key in seen:
+                continue
+            seen.add(key)
+
+        yield solution
+        count += 1
+        if limit is not None and count >= limit:
+            return
+
+
+def solve_crossword(crossword, dictionary, letter_index, ac3=False, cbj=False, rng=None, stats=None, restarts=None,
+                    ordering='mrv', lcv=False, patterns=None, all_different=True, packed=None):
+    """
+    Solves a crossword without printing it
+    :param crossword: crossword puzzle, left unchanged
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param ac3: propagate arc consistency before search, and after each assignment unless cbj is set:
+    conflict-directed backjumping, with or without restarts, only prunes the domains before search
+    :param cbj: search with conflict-directed backjumping and nogood learning
+    :param rng: numpy random generator reordering the domains, None for an unseeded order
+    :param stats: Instrumentation, or None to disable
+    :param restarts: restart schedule ('luby' or 'geometric'), None to search without restarts
+    :param ordering: variable ordering strategy, see variable_ordering.create_ordering
+    :param lcv: try the values by least constraining value
+    :param patterns: PatternCache of the dictionary narrowing the domains, None to narrow letter by letter
+    :param all_different: forbid the same word in two slots (the nogoods of conflict-directed backjumping then
+    also hold the words the other slots could repeat)
+    :param packed: PackedDictionary of the dictionary narrowing the domains, None to use the word matrices
+    :return: solved crossword, or None if unsatisfiable
+    """
+    if not cbj and restarts is None:
+        return next(iter_solutions(crossword, dictionary, letter_index, 1, ac3, rng=rng, stats=stats,
+                                   ordering=ordering, lcv=lcv, patterns=patterns, all_different=all_different,
+                                   packed=packed), None)
 
-    signal.signal(signal.SIGALRM, handler)
-    signal.alarm(1)
+    prepared = prepare_search(crossword, dictionary, letter_index, ac3, rng)
+    if prepared is None:
+        return None
+    words, domains = prepared
+
+    grid = crossword.copy()
+    nogoods = Nogoods(10000, 12) if cbj else None
+    with contextlib.redirect_stdout(io.StringIO()):
+        if restarts is not None:
+            lva, r = restart_search(words, domains, grid, ac3, cbj, restarts, rng=rng, stats=stats, nogoods=nogoods,
+                                    ordering=ordering, lcv=lcv, patterns=patterns, all_different=all_different,
+                                    packed=packed)
+        else:
+            trail = create_trail(words, ordering, lcv, patterns, all_different, packed)
+            lva, r, _ = backtracking_cbj({}, words, domains, grid, {}, cell_words(words), nogoods, stats, trail)
+
+    if r == 0:
+        return None
+    return store_to_crossword(lva, crossword.copy())
+
+
+def solve_stoppable(crossword, dictionary, letter_index, seconds=None, cancel=None, check_every=16, ac3=False,
+                    cbj=False, rng=None, stats=None, restarts=None, ordering='mrv', lcv=False, patterns=None,
+                    all_different=True, packed=None):
+    """
+    Solves a crossword with a deadline and a cancellation token checked cooperatively by the search, so that
+    it can run in any thread, e.g. of a server, without signals or a process to kill
+    :param crossword: crossword puzzle, left unchanged
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param seconds: time allowed to the search, None for no deadline
+    :param cancel: token whose is_set() stops the search (threading.Event, multiprocessing.Event...), None for
+    none
+    :param check_every: number of nodes between two checks of the deadline and the token
+    :param stats: Instrumentation, or None for a new one
+    :return: instrumentation.SolveResult ('solved' with the crossword, 'unsatisfiable', 'timeout' or
+    'cancelled') with the search counters. The other parameters are those of solve_crossword.
+    """
+    if stats is None:
+        stats = instrumentation.Instrumentation()
+
+    def solve():
+        return solve_crossword(crossword, dictionary, letter_index, ac3, cbj, rng, stats, restarts, ordering, lcv,
+                               patterns, all_different, packed)
+
+    return instrumentation.stoppable_solve(solve, stats, seconds, cancel, check_every)
+
+
+def solve_cached(cache, crossword, dictionary, letter_index, fresh=False, fingerprint=None, ac3=False, rng=None,
+                 stats=None, ordering='mrv', lcv=False, patterns=None, all_different=True, packed=None):
+    """
+    Solves a crossword through the on-disk solution cache. A puzzle already solved with the same dictionary,
+    or whose transpose was, is answered from the cache without searching.
+    :param cache: solution_cache.SolutionCache
+    :param crossword: crossword puzzle, left unchanged
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param fresh: search a fill that is not cached yet, to get an alternative to the cached ones
+    :param fingerprint: fingerprint of the dictionary from solution_cache.dictionary_fingerprint, None to
+    compute it
+    :return: solved crossword, or None if unsatisfiable (or, when fresh, if every fill is cached already).
+    The other parameters are those of iter_solutions.
+    """
+    if fingerprint is None:
+        fingerprint = solution_cache.dictionary_fingerprint(dictionary)
+
+    known = solution_cache.lookup_fills(cache, crossword, fingerprint, all_different)
+    if known and not fresh:
+        return np.array(known[0])
+
+    seen = {fill.tobytes() for fill in known}
+    for solution in iter_solutions(crossword, dictionary, letter_index, None, ac3, rng=rng, stats=stats,
+                                   ordering=ordering, lcv=lcv, patterns=patterns, all_different=all_different,
+                                   packed=packed):
+        if solution.tobytes() in seen:
+            continue
+        solution_cache.store_fill(cache, crossword, fingerprint, solution, all_different)
+        return solution
+
+    return None
+
+
+def unfilled_slots(words, crossword):
+    """
+    Lists the words of a crossword with at least one empty cell
+    :param words: words of the crossword
+    :param crossword: crossword puzzle
+    :return: list of (position, horizontal, length) of the unfilled words
+    """
+    unfilled = []
+    for w in words:
+        x, y = w.pos
+        cells = crossword[x, y:y + w.length] if w.horizontal == 1 else crossword[x:x + w.length, y]
+        if not cells.all():
+            unfilled.append((w.pos, w.horizontal, w.length))
+    return unfilled
+
+
+def anytime_solve(crossword, dictionary, letter_index, seconds=None, nodes=None, ac3=False, rng=None, stats=None,
+                  ordering='mrv', lcv=False, patterns=None, all_different=True):
+    """
+    Solves a crossword within a budget of time or nodes. The most filled consistent partial grid met by the
+    search is kept, and returned with its unfilled words if the budget runs out before a solution.
+    :param crossword: crossword puzzle, left unchanged
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param seconds: wall-clock budget, None for no time limit
+    :param nodes: node budget, None for no node limit
+    :param ac3: propagate arc consistency before search and after each assignment
+    :param rng: numpy random generator reordering the domains, None for an unseeded order
+    :param stats: Instrumentation, or None
+    :param ordering: variable ordering strategy, see variable_ordering.create_ordering
+    :param lcv: try the values by least constraining value
+    :param patterns: PatternCache of the dictionary narrowing the domains, None to narrow letter by letter
+    :param all_different: forbid the same word in two slots
+    :return: (grid, unfilled words from unfilled_slots). The grid is the solution with no unfilled words, the
+    best partial fill when out of budget, or None if the crossword is unsatisfiable.
+    """
+    prepared = prepare_search(crossword, dictionary, letter_index, ac3, rng)
+    if prepared is None:
+        return None, unfilled_slots(create_words(crossword), crossword)
+    words, domains = prepared
+
+    if stats is None:
+        stats = instrumentation.Instrumentation()
+    grid = crossword.copy()
+    trail = create_trail(words, ordering, lcv, patterns, all_different)
+    # crossings agree, so every cell pushed on the trail was empty: the grid has start + len(trail.cells) letters
+    start = int(np.count_nonzero(crossword))
+    best = [crossword.copy(), start]
+    deadline = None if seconds is None else time.perf_counter() + seconds
+
+    def keep_best(stats, depth):
+        filled = start + len(trail.cells)
+        if filled > best[1]:
+            best[0][:] = grid
+            best[1] = filled
+        if deadline is not None and time.perf_counter() >= deadline:
+            raise instrumentation.SearchCutoff
+
+    stats.nodeHooks.append(keep_best)
+    if nodes is not None:
+        stats.limit = ('nodes', stats.nodes + nodes)
 
     try:
-        backtracking_forward_checking({}, copy.deepcopy(words), copy.deepcopy(domains), 0, copy.deepcopy(crossword))
-    except Exception as exc:
-        print(exc)
-        long_crossword_signal(words, domains, crossword)
+        solution = next(search_solutions(words, domains, grid, ac3, stats, trail), None)
+        if solution is None:
+            return None, unfilled_slots(words, crossword)
+        return solution, []
+    except instrumentation.SearchCutoff:
+        return best[0], unfilled_slots(words, best[0])
+    finally:
+        stats.nodeHooks.remove(keep_best)
+        stats.limit = None
+
+
+def solve_decomposed(crossword, dictionary, letter_index, ac3=False, rng=None, stats=None, ordering='mrv',
+                     lcv=False, patterns=None, all_different=True):
+    """
+    Solves a crossword one connected component of its crossing graph at a time, splitting the components
+    further as the search assigns words (see backtracking_decomposed)
+    :param crossword: crossword puzzle, left unchanged
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param ac3: propagate arc consistency before search and after each assignment
+    :param rng: numpy random generator reordering the domains, None for an unseeded order
+    :param stats: Instrumentation, or None to disable
+    :param ordering: variable ordering strategy, see variable_ordering.create_ordering
+    :param lcv: try the values by least constraining value
+    :param patterns: PatternCache of the dictionary narrowing the domains, None to narrow letter by letter
+    :param all_different: forbid the same word in two slots
+    :return: solved crossword, or None if unsatisfiable
+    """
+    prepared = prepare_search(crossword, dictionary, letter_index, ac3, rng)
+    if prepared is None:
+        return None
+    words, domains = prepared
+
+    grid = crossword.copy()
+    trail = create_trail(words, ordering, lcv, patterns, all_different)
+    if solve_components(connected_components(words), domains, grid, ac3, stats, trail):
+        return grid
+    return None
 
 
-# Handling function timeout using Process.join()
-def long_crossword_join(words, domains, crossword):
+def component_grid(crossword, words):
     """
-    Handling function
-    :param words:
-    :param domains:
-    :param crossword:
-    :return:
+    Cuts a component out of a crossword, blocking the cells of the other components
+    :param crossword: crossword puzzle
+    :param words: words of the component
+    :return: crossword holding only the cells of the component
+    """
+    grid = np.full_like(crossword, 35)
+    for w in words:
+        x, y = w.pos
+        if w.horizontal == 1:
+            grid[x, y:y + w.length] = crossword[x, y:y + w.length]
+        else:
+            grid[x:x + w.length, y] = crossword[x:x + w.length, y]
+    return grid
+
+
+def has_repeats(words, crossword):
+    """
+    Checks whether two words of a crossword hold the same letters
+    :param words: words of the crossword
+    :param crossword: crossword puzzle
+    :return: Boolean
+    """
+    seen = set()
+    for w in words:
+        pattern = word_pattern(w, crossword)
+        if pattern in seen:
+            return True
+        seen.add(pattern)
+    return False
+
+
+def component_worker(task):
+    """
+    Solves a component cut out of a crossword in a pool worker, using a dictionary from shared memory
+    :param task: (component crossword, description of the shared dictionary, ac3, all_different)
+    :return: solved component crossword, or None if unsatisfiable
+    """
+    grid, shared, ac3, all_different = task
+    dictionary, letter_index, handles = shared_dictionary.attach_dictionary(shared)
+    return solve_decomposed(grid, dictionary, letter_index, ac3, all_different=all_different)
+
+
+def components_solve(crossword, dictionary, letter_index, workers=None, ac3=False, all_different=True):
+    """
+    Solves the connected components of a crossword in parallel worker processes and merges their solutions.
+    The search stops as soon as one component is unsatisfiable. The dictionary is placed once in shared
+    memory for all workers. Workers cannot see the words used by the others: if the merged solution repeats
+    a word, the crossword is solved again in this process.
+    :param crossword: crossword puzzle
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param workers: number of worker processes, one per core by default
+    :param ac3: propagate arc consistency before search and after each assignment
+    :param all_different: forbid the same word in two slots
+    :return: solved crossword, or None if unsatisfiable
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    words = create_words(crossword)
+    components = connected_components(words)
+    if workers < 2 or len(components) < 2:
+        return solve_decomposed(crossword, dictionary, letter_index, ac3, all_different=all_different)
+
+    shared, handles = shared_dictionary.share_dictionary(dictionary, letter_index)
+    tasks = [(component_grid(crossword, c), shared, ac3, all_different) for c in components]
+    solution = crossword.copy()
+
+    try:
+        with multiprocessing.Pool(min(workers, len(components))) as pool:
+            for grid in pool.imap_unordered(component_worker, tasks):
+                if grid is None:
+                    return None
+                cells = grid != 35
+                solution[cells] = grid[cells]
+    finally:
+        shared_dictionary.release_dictionary(handles)
+
+    if all_different and has_repeats(words, solution):
+        return solve_decomposed(crossword, dictionary, letter_index, ac3)
+    return solution
+
+
+def worker_message(messages, processes, deadline=None, needs_all=False, poll=0.5):
+    """
+    Waits for a message from worker processes, checking between polls of the queue that they are still
+    alive, so that a worker killed by a signal or out of memory does not block the search forever
+    :param messages: multiprocessing queue written by the workers
+    :param processes: worker processes
+    :param deadline: time.time() after which to give up, None to wait for as long as workers are alive
+    :param needs_all: Boolean, True if no message can come once any worker died, False if it can come as long
+    as one worker is alive
+    :param poll: seconds between two checks of the workers
+    :return: message
+    """
+    while True:
+        timeout = poll if deadline is None else min(poll, max(deadline - time.time(), 0))
+        try:
+            return messages.get(timeout=timeout)
+        except queue.Empty:
+            if deadline is not None and time.time() >= deadline:
+                raise
+
+        dead = [p for p in processes if p.exitcode is not None]
+        if dead and (needs_all or len(dead) == len(processes)):
+            # a message sent just before exiting may still be in the pipe
+            try:
+                return messages.get(timeout=poll)
+            except queue.Empty:
+                codes = ', '.join(str(p.exitcode) for p in dead)
+                raise RuntimeError(f"{len(dead)} worker process(es) exited without reporting (exit codes {codes})")
+
+
+def portfolio_worker(crossword, shared, seed, ac3, solutions):
+    """
+    Solves a crossword with its own value ordering, using a dictionary from shared memory
+    :param crossword: crossword puzzle
+    :param shared: description of the shared dictionary
+    :param seed: seed of the value ordering of this worker
+    :param ac3: propagate arc consistency before search and after each assignment
+    :param solutions: multiprocessing queue receiving (seed, solved crossword or None if unsatisfiable)
+    :return: None
+    """
+    dictionary, letter_index, handles = shared_dictionary.attach_dictionary(shared)
+    solution = solve_crossword(crossword, dictionary, letter_index, ac3, rng=np.random.default_rng(seed))
+    solutions.put((seed, solution))
+
+
+def portfolio_solve(crossword, dictionary, letter_index, workers=None, ac3=False, seed=0, timeout=None):
+    """
+    Races forward checking workers with different value orderings on the same crossword. The first solution
+    wins and the other workers are stopped. The dictionary is placed once in shared memory for all workers.
+    :param crossword: crossword puzzle
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param workers: number of worker processes, one per core by default
+    :param ac3: propagate arc consistency before search and after each assignment
+    :param seed: seed of the first worker, the others use the following seeds
+    :param timeout: seconds before giving up, None to wait for a solution or for every worker to fail
+    :return: solved crossword, or None if unsatisfiable or out of time
+    :raises RuntimeError: if every worker died before one solved the crossword or proved it unsatisfiable
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    shared, handles = shared_dictionary.share_dictionary(dictionary, letter_index)
+    solutions = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=portfolio_worker,
+                                         args=(crossword, shared, seed + i, ac3, solutions)) for i in range(workers)]
+
+    solution = None
+    unsatisfiable = False
+    deadline = None if timeout is None else time.time() + timeout
+
+    try:
+        for p in processes:
+            p.start()
+
+        for _ in range(workers):
+            _, solution = worker_message(solutions, processes, deadline)
+            if solution is not None:
+                break
+            unsatisfiable = True
+    except queue.Empty:
+        pass
+    except RuntimeError:
+        # every worker searches the whole tree, so one that finished proved the crossword unsatisfiable
+        if not unsatisfiable:
+            raise
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.kill()
+            p.join()
+        shared_dictionary.release_dictionary(handles)
+
+    return solution
+
+
+def apply_prefix(words, domains, grid, trail, prefix, ac3=False, stats=None):
+    """
+    Assigns the words of a subproblem on a search state at its root and narrows the other domains by forward
+    checking. The trail gets a new ordering over the other words; undo to the start of the trail and
+    reset_words bring the state back to the root.
+    :param words: words of the crossword
+    :param domains: domains, updated in place
+    :param grid: crossword, updated in place
+    :param trail: Trail of the state, holding nothing yet
+    :param prefix: tuple of (word ID, word index) assignments of the subproblem
+    :param ac3: propagate arc consistency after each assignment
+    :param stats: Instrumentation counting the wipeouts, or None
+    :return: not assigned words, or None if the prefix wipes out a domain or repeats a word
+    """
+    assigned = {var_id for var_id, _ in prefix}
+    lvna = [w for w in words if w.id not in assigned]
+    trail.ordering = variable_ordering.create_ordering(lvna, trail.ordering.strategy, lcv=trail.ordering.lcv)
+    unassigned = trail.ordering.unassigned
+
+    for var_id, value_id in prefix:
+        var = words[var_id]
+        if trail.used is not None and trail.used[var.length][value_id]:
+            return None
+        var.letters = var.words[value_id].tolist()
+        store_word_on_trail(var, grid, trail)
+        use_word(var, value_id, trail)
+        if not update_domains(var, unassigned, grid, domains, trail, stats):
+            return None
+        if ac3 and not arc_consistency(unassigned, domains, {inter.intersectedID for inter in var.intersections},
+                                       trail, stats):
+            return None
+
+    return lvna
+
+
+def reset_words(words, grid, trail):
+    """
+    Brings a search state back to its root, whatever point its search stopped at
+    :param words: words of the crossword
+    :param grid: crossword, updated in place
+    :param trail: Trail of the state
+    :return: None
     """
-    # Using processes and not threads because formers don't share variables.
+    undo(trail, (0, 0, 0), grid)
+    for w in words:
+        w.letters = [0] * w.length
+        w.prunedBy = []
+
 
-    p = multiprocessing.Process(target=backtracking_forward_checking, args=({}, words, domains, 0, crossword))
-    p.start()
+def split_prefix(words, domains, grid, trail, prefix, ac3=False):
+    """
+    Splits a subproblem into one subproblem per value of its most constrained word
+    :param words: words of the crossword
+    :param domains: domains of the state at its root
+    :param grid: crossword at its root
+    :param trail: Trail of the state, holding nothing yet
+    :param prefix: tuple of (word ID, word index) assignments of the subproblem
+    :param ac3: propagate arc consistency after each assignment
+    :return: list of the prefixes of the subproblems, empty if the subproblem has no solution
+    """
+    lvna = apply_prefix(words, domains, grid, trail, prefix, ac3)
+    if not lvna:
+        children = [prefix] if lvna is not None else []
+    else:
+        var = trail.ordering.heap[0]
+        children = [prefix + ((var.id, int(value_id)),) for value_id in candidate_values(var, domains, trail)]
+    reset_words(words, grid, trail)
+    return children
 
-    p.join(1)
 
-    if p.is_alive():
-        p.kill()
-        p.join()
-        domains = shuffle_domains(domains)
-        long_crossword_join(words, domains, crossword)
+def hand_off_values(prefix, choices):
+    """
+    Takes the values not tried yet at the shallowest open choice point of a search, which then goes on with
+    the value it is trying there and the choice points below
+    :param prefix: tuple of (word ID, word index) assignments of the subproblem searched
+    :param choices: ChoicePoint of each level of the search, from trail.choices
+    :return: list of the prefixes of the subproblems of the values taken, empty if no choice point is open
+    """
+    path = prefix
+    for choice in choices:
+        if choice.next < len(choice.values):
+            rest = [int(value_id) for value_id in choice.values[choice.next:]]
+            choice.values = choice.values[:choice.next]
+            return [path + ((choice.var.id, value_id),) for value_id in rest]
+        path += ((choice.var.id, int(choice.value)),)
+    return []
 
 
-def execute_forward_checking(crossword_name, dictionary_name, forward_checking_version):
+def finish_task(pending, results):
+    """
+    Counts a subproblem of the work-stealing search as done, reporting the end of the search after the last
+    one
+    :param pending: multiprocessing value of the subproblems queued or being searched
+    :param results: multiprocessing queue of the messages to the search
+    :return: None
+    """
+    with pending.get_lock():
+        pending.value -= 1
+        if pending.value == 0:
+            results.put(('exhausted', None))
+
+
+def stealing_worker(crossword, shared, seed, ac3, all_different, budget, tasks, pending, idle, stop, results):
+    """
+    Searches the subproblems of the work-stealing search taken from a shared queue. A worker having searched
+    a subproblem longer than the node budget while another worker waits for work hands the values not tried
+    yet at its shallowest open choice point back to the queue, one subproblem each, and goes on with the
+    rest of its subproblem.
+    :param crossword: crossword puzzle
+    :param shared: description of the shared dictionary
+    :param seed: seed of the value ordering of this worker
+    :param ac3: propagate arc consistency before search and after each assignment
+    :param all_different: forbid the same word in two slots
+    :param budget: nodes searched in a subproblem before it may hand work over
+    :param tasks: multiprocessing queue of the prefixes of the subproblems, None to exit
+    :param pending: multiprocessing value of the subproblems queued or being searched
+    :param idle: multiprocessing value of the workers waiting for a subproblem
+    :param stop: multiprocessing event set once a solution is found
+    :param results: multiprocessing queue of the messages to the search
+    :return: None
+    """
+    # the search stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    dictionary, letter_index, handles = shared_dictionary.attach_dictionary(shared)
+    grid = crossword.copy()
+    words = create_words(grid)
+    domains, words = create_domains(dictionary, letter_index, words, np.random.default_rng(seed))
+    if ac3:
+        arc_consistency(words, domains)
+    trail = create_trail(words, all_different=all_different)
+
+    stats = instrumentation.Instrumentation(64)
+    stats.cancel = stop
+    prefix = ()
+    task_start = 0
+
+    def offer_work(stats, depth):
+        if idle.value > 0 and tasks.empty() and stats.nodes - task_start > budget:
+            children = hand_off_values(prefix, trail.choices)
+            with pending.get_lock():
+                pending.value += len(children)
+            for child in children:
+                tasks.put(child)
+
+    stats.hooks.append(offer_work)
+
+    try:
+        while True:
+            with idle.get_lock():
+                idle.value += 1
+            prefix = tasks.get()
+            with idle.get_lock():
+                idle.value -= 1
+            if prefix is None:
+                return
+            if stop.is_set():
+                continue
+
+            task_start = stats.nodes
+            trail.choices = []
+            try:
+                lvna = apply_prefix(words, domains, grid, trail, prefix, ac3, stats)
+                solution = None
+                if lvna is not None:
+                    solution = next(search_solutions(lvna, domains, grid, ac3, stats, trail), None)
+            except instrumentation.SearchStopped:
+                reset_words(words, grid, trail)
+                continue
+
+            reset_words(words, grid, trail)
+            if solution is not None:
+                stop.set()
+                results.put(('solved', solution))
+            finish_task(pending, results)
+    except Exception as exc:
+        results.put(('error', f'{type(exc).__name__}: {exc}'))
+
+
+def stealing_solve(crossword, dictionary, letter_index, workers=None, ac3=False, all_different=True, budget=1000,
+                   seed=0):
+    """
+    Searches the forward checking tree of a crossword in parallel without duplicating work, e.g. to prove a
+    hard crossword unsatisfiable. The tree is split into one subproblem per value of its most constrained word,
+    and the subproblems are handed out to worker processes from a shared queue. A worker searching a
+    subproblem for long while another one is idle hands it the values it has not tried yet at its shallowest
+    open choice point (work stealing). The first solution stops every worker; the crossword is unsatisfiable
+    once all subproblems are exhausted. The dictionary is placed once in shared memory for all workers. A
+    single worker would never be asked for work, so it searches in this process with geometric restarts
+    instead, which keep it out of the heavy tail of one unlucky tree at a bounded cost on unsatisfiable ones.
+    :param crossword: crossword puzzle
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param workers: number of worker processes, one per core by default
+    :param ac3: propagate arc consistency before search and after each assignment
+    :param all_different: forbid the same word in two slots
+    :param budget: nodes searched in a subproblem before it may hand work over
+    :param seed: seed of the value ordering of the first worker, the others use the following seeds
+    :return: solved crossword, or None if unsatisfiable
+    :raises RuntimeError: if a worker failed or died, its subproblem being lost
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers == 1:
+        return solve_crossword(crossword, dictionary, letter_index, ac3, restarts='geometric',
+                               rng=np.random.default_rng(seed), all_different=all_different)
+
+    prepared = prepare_search(crossword, dictionary, letter_index, ac3, np.random.default_rng(seed))
+    if prepared is None:
+        return None
+    words, domains = prepared
+    grid = crossword.copy()
+    roots = split_prefix(words, domains, grid, create_trail(words, all_different=all_different), (), ac3)
+    if not roots:
+        return None
+
+    shared, handles = shared_dictionary.share_dictionary(dictionary, letter_index)
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    pending = multiprocessing.Value('i', len(roots))
+    idle = multiprocessing.Value('i', 0)
+    stop = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=stealing_worker,
+                                         args=(crossword, shared, seed + i, ac3, all_different, budget, tasks,
+                                               pending, idle, stop, results)) for i in range(workers)]
+
+    try:
+        for root in roots:
+            tasks.put(root)
+        for p in processes:
+            p.start()
+
+        status, solution = worker_message(results, processes, needs_all=True)
+        if status == 'error':
+            raise RuntimeError(f"work-stealing worker failed: {solution}")
+    finally:
+        stop.set()
+        for _ in processes:
+            tasks.put(None)
+        for p in processes:
+            p.join(1)
+            if p.is_alive():
+                p.kill()
+                p.join()
+        shared_dictionary.release_dictionary(handles)
+
+    return solution
+
+
+def search_engine(portfolio=None, stealing=None, decompose=None, budget=None, solutions=None, cbj=False,
+                  restarts=None, ordering='mrv', lcv=False, all_different=True):
+    """
+    Picks the search run by execute_forward_checking from its arguments
+    :param portfolio: see execute_forward_checking
+    :param stealing: see execute_forward_checking
+    :param decompose: see execute_forward_checking
+    :param budget: see execute_forward_checking
+    :param solutions: see execute_forward_checking
+    :param cbj: see execute_forward_checking
+    :param restarts: see execute_forward_checking
+    :param ordering: see execute_forward_checking
+    :param lcv: see execute_forward_checking
+    :param all_different: see execute_forward_checking
+    :return: 'solutions', 'portfolio', 'stealing', 'decompose', 'budget', 'restarts', 'cbj' or 'forward_checking'
+    :raises ValueError: if the arguments ask for several searches, or for options the search would ignore
+    """
+    searches = {'solutions': solutions, 'portfolio': portfolio, 'stealing': stealing, 'decompose': decompose,
+                'budget': budget}
+    chosen = [name for name, value in searches.items() if value is not None]
+    if len(chosen) > 1:
+        raise ValueError(f"conflicting searches: {', '.join(chosen)}")
+    if not chosen:
+        if restarts is not None:
+            return 'restarts'
+        return 'cbj' if cbj else 'forward_checking'
+
+    search = chosen[0]
+    options = {'cbj': cbj, 'restarts': restarts is not None, 'ordering': ordering != 'mrv', 'lcv': lcv,
+               'all_different': not all_different}
+    supported = {'solutions': {'ordering', 'lcv', 'all_different'},
+                 'portfolio': set(),
+                 'stealing': {'all_different'},
+                 'decompose': {'ordering', 'lcv', 'all_different'} if decompose == 1 else {'all_different'},
+                 'budget': {'ordering', 'lcv', 'all_different'}}
+    ignored = [name for name, value in options.items() if value and name not in supported[search]]
+    if ignored:
+        raise ValueError(f"the {search} search does not support {', '.join(ignored)}")
+    return search
+
+
+def execute_forward_checking(crossword_name, dictionary_name, forward_checking_version, ac3=False, portfolio=None,
+                             cbj=False, max_nogoods=10000, max_nogood_cells=12, stats=None, restarts=None,
+                             ordering='mrv', lcv=False, budget=None, decompose=None, all_different=True,
+                             solutions=None, fresh=False, stealing=None):
     """
     Executes forward checking algorithm
     :param crossword_name: Name of crossword text file
     :param dictionary_name: Name of dictionary text file
     :param forward_checking_version: Boolean for forward checking
+    :param ac3: Boolean for arc consistency propagation before search, and after each assignment unless cbj is
+    set
+    :param portfolio: Number of parallel workers racing on the crossword, None to search in this process
+    :param cbj: Boolean for conflict-directed backjumping (the search itself then uses forward checking only)
+    :param max_nogoods: Number of nogoods kept by conflict-directed backjumping, 0 to disable learning. With
+    all_different the nogoods hold whole words, so they match less often and can cost more than they prune
+    :param max_nogood_cells: Number of cells above which a nogood is not kept
+    :param stats: Instrumentation printed at the end, or None to disable
+    :param restarts: restart schedule ('luby' or 'geometric'), None to search without restarts
+    :param ordering: variable ordering strategy ('mrv', 'mrv_degree' or 'domwdeg')
+    :param lcv: Boolean for least constraining value ordering
+    :param budget: seconds allowed to the search, printing the best partial fill when out of time, None for no limit
+    :param decompose: Number of worker processes solving the independent components of the crossword, 1 to
+    solve them in this process, None to search the crossword as a whole
+    :param all_different: Boolean forbidding the same word in two slots (the nogoods of conflict-directed
+    backjumping then also hold the words the other slots could repeat)
+    :param solutions: solution_cache.SolutionCache answering the crosswords already solved (the search then
+    uses plain forward checking), None to bypass it
+    :param fresh: Boolean asking the solution cache for a fill it does not hold yet
+    :param stealing: Number of worker processes sharing the search tree of the crossword through work stealing,
+    None to search in this process
     :return: None
+    :raises ValueError: if the arguments ask for several searches, or for options the search would ignore
     """
+    engine = search_engine(portfolio, stealing, decompose, budget, solutions, cbj, restarts, ordering, lcv,
+                           all_different)
+    if not forward_checking_version and engine != 'forward_checking':
+        raise ValueError(f"backtracking does not support the {engine} search")
     start_time = time.time()
 
-    crossword = load_crossword(crossword_name)
-
-    horizontal_words = search_hor_vars(crossword, 0)
-    vertical_words = search_vert_words(crossword, len(horizontal_words))
-    words = horizontal_words + vertical_words
-    words = intersections(words, horizontal_words, vertical_words, crossword)
+    with instrumentation.phase(stats, 'parse'):
+        crossword = load_crossword(crossword_name)
+    words = create_words(crossword, stats)
 
-    dict = fill_dict(dictionary_name)
-    domains, words = create_domains(dict, words)
+    with instrumentation.phase(stats, 'dictionary load'):
+        dict, letter_index = fill_dict(dictionary_name)
+        domains, words = create_domains(dict, letter_index, words)
 
     if not forward_checking_version:
         bt_start = time.time()
 
-        lva, r = backtracking({}, words, domains, 0, crossword)
+        lva, r = backtracking({}, words, domains, 0, crossword, all_different)
         crossword = store_to_crossword(lva, crossword)
         print_crossword(crossword)
 
@@ -560,11 +2164,52 @@ def execute_forward_checking(crossword_name, dictionary_name, forward_checking_v
 
     else:
         fc_start = time.time()
-        if crossword_name == "crossword_2.txt":
-            long_crossword_join(words, domains, crossword)
+        unfilled = []
+        with instrumentation.phase(stats, 'search'):
+            if engine == 'solutions':
+                solution = solve_cached(solutions, crossword, dict, letter_index, fresh, ac3=ac3, stats=stats,
+                                        ordering=ordering, lcv=lcv, all_different=all_different)
+            elif ac3 and not arc_consistency(words, domains, stats=stats):
+                solution = None
+            elif engine == 'portfolio':
+                solution = portfolio_solve(crossword, dict, letter_index, portfolio, ac3)
+            elif engine == 'stealing':
+                solution = stealing_solve(crossword, dict, letter_index, stealing, ac3, all_different)
+            elif engine == 'decompose' and decompose == 1:
+                solution = solve_decomposed(crossword, dict, letter_index, ac3, stats=stats, ordering=ordering,
+                                            lcv=lcv, all_different=all_different)
+            elif engine == 'decompose':
+                solution = components_solve(crossword, dict, letter_index, decompose, ac3, all_different)
+            elif engine == 'budget':
+                solution, unfilled = anytime_solve(crossword, dict, letter_index, budget, ac3=ac3, stats=stats,
+                                                   ordering=ordering, lcv=lcv, all_different=all_different)
+            else:
+                # these searches print the crossword when they solve it, it is printed once below instead
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if engine == 'restarts':
+                        nogoods = Nogoods(max_nogoods, max_nogood_cells) if cbj and max_nogoods > 0 else None
+                        lva, r = restart_search(words, domains, crossword, ac3, cbj, restarts, stats=stats,
+                                                nogoods=nogoods, ordering=ordering, lcv=lcv,
+                                                all_different=all_different)
+                    elif engine == 'cbj':
+                        trail = create_trail(words, ordering, lcv, all_different=all_different)
+                        nogoods = Nogoods(max_nogoods, max_nogood_cells) if max_nogoods > 0 else None
+                        lva, r, _ = backtracking_cbj({}, words, domains, crossword, {}, cell_words(words), nogoods,
+                                                     stats, trail)
+                    else:
+                        trail = create_trail(words, ordering, lcv, all_different=all_different)
+                        lva, r = backtracking_forward_checking({}, words, domains, 0, crossword, ac3, stats, trail)
+                solution = store_to_crossword(lva, crossword.copy()) if r else None
+
+        if solution is None:
+            print("No solution found")
         else:
-
-            lva, r = backtracking_forward_checking({}, words, domains, 0, crossword)
+            # the budget search leaves the cells of its unfilled words empty
+            print_crossword(np.where(solution == 0, ord('0'), solution))
+            if unfilled:
+                print(f"\nOut of time, {len(unfilled)} unfilled words:")
+                for pos, horizontal, length in unfilled:
+                    print(f"  {'horizontal' if horizontal == 1 else 'vertical'} at {pos}, length {length}")
         fc_end = time.time()
         fc_elapsed_time = fc_end - fc_start
         print("\nForward Checking: ", fc_elapsed_time, "seconds")
@@ -574,6 +2219,10 @@ def execute_forward_checking(crossword_name, dictionary_name, forward_checking_v
 
     print("Total elapsed time: ", total_elapsed_time, "seconds\n\n")
 
+    if stats is not None:
+        for key, value in instrumentation.report(stats).items():
+            print(f"{key}: {value}")
+
 
 def print_outputs():
     """
@@ -587,7 +2236,7 @@ def print_outputs():
     execute_forward_checking("crossword_1.txt", "word_list.txt", True)
 
     print("CROSSWORD A Forward Checking\n")
-    execute_forward_checking("crossword_2.txt", "words.txt", True)
+    execute_forward_checking("crossword_2.txt", "words.txt", True, portfolio=multiprocessing.cpu_count())
 
     print("CROSSWORD A Forward Checking\n")
-    execute_forward_checking("crossword_3.txt", "words.txt", True)
+    execute_forward_checking("crossword_3.txt", "words.txt", True, restarts='luby')
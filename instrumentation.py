@@ -0,0 +1,192 @@
+import contextlib
+import time
+
+
+class SearchCutoff(Exception):
+    """
+    Raised by enter_node when the search has spent its budget
+    """
+
+
+class SearchStopped(Exception):
+    """
+    Raised by enter_node when the search is past its deadline ('timeout') or cancelled ('cancelled')
+    """
+
+
+class SolveResult:
+    def __init__(self, status, solution, stats):
+        # 'solved', 'unsatisfiable', 'timeout' or 'cancelled'
+        self.status = status
+        # solution returned by the solver, None unless solved
+        self.solution = solution
+        # report of the search counters when it ended
+        self.stats = stats
+
+
+class Instrumentation:
+    def __init__(self, sample_every=0, report_every=0.0, report_to=print):
+        # counters
+        self.nodes = 0
+        self.backtracks = 0
+        self.checks = 0
+        self.wipeouts = {}
+        self.maxDepth = 0
+        self.restarts = 0
+        # (counter name, value) at which enter_node raises SearchCutoff, None for no budget
+        self.limit = None
+        # time.perf_counter() after which enter_node raises SearchStopped, None for no deadline
+        self.deadline = None
+        # token whose is_set() stops the search (threading.Event, multiprocessing.Event...), None for none
+        self.cancel = None
+        # number of nodes between two checks of the deadline and the cancellation token
+        self.checkEvery = 16
+        # seconds spent per phase (parse, slot extraction, intersections, dictionary load, search)
+        self.phases = {}
+        # callables(instrumentation, depth) called every sampleEvery nodes from the search, e.g. to sample its stack
+        self.hooks = []
+        self.sampleEvery = sample_every
+        # callables(instrumentation, depth) called at every node whatever the sampling, e.g. to follow the search
+        self.nodeHooks = []
+        # report_to(report) called every reportEvery seconds during the search
+        self.reportEvery = report_every
+        self.reportTo = report_to
+        self.start = time.perf_counter()
+        self.lastReport = self.start
+
+
+def count(stats, key):
+    """
+    Increments a search counter
+    :param stats: Instrumentation, or None when not instrumenting
+    :param key: name of the counter
+    :return: None
+    """
+    if stats is not None:
+        setattr(stats, key, getattr(stats, key) + 1)
+
+
+def enter_node(stats, depth):
+    """
+    Records a node of the search tree. Calls the node hooks, the sampling hooks and emits the periodic report
+    when due.
+    :param stats: Instrumentation, or None when not instrumenting
+    :param depth: number of assigned variables
+    :return: None
+    """
+    if stats is None:
+        return
+
+    if stats.limit is not None and getattr(stats, stats.limit[0]) >= stats.limit[1]:
+        raise SearchCutoff
+
+    stats.nodes += 1
+    if depth > stats.maxDepth:
+        stats.maxDepth = depth
+
+    if (stats.deadline is not None or stats.cancel is not None) and stats.nodes % stats.checkEvery == 0:
+        check_stop(stats)
+
+    for hook in stats.nodeHooks:
+        hook(stats, depth)
+
+    if stats.sampleEvery and stats.nodes % stats.sampleEvery == 0:
+        for hook in stats.hooks:
+            hook(stats, depth)
+
+    if stats.reportEvery:
+        now = time.perf_counter()
+        if now - stats.lastReport >= stats.reportEvery:
+            stats.lastReport = now
+            stats.reportTo(report(stats))
+
+
+def check_stop(stats):
+    """
+    Stops the search if it is cancelled or past its deadline
+    :param stats: Instrumentation
+    :return: None
+    """
+    if stats.cancel is not None and stats.cancel.is_set():
+        raise SearchStopped('cancelled')
+    if stats.deadline is not None and time.perf_counter() > stats.deadline:
+        raise SearchStopped('timeout')
+
+
+def stoppable_solve(solve, stats, seconds=None, cancel=None, check_every=16):
+    """
+    Runs a solve that stops cooperatively: the search checks its deadline and cancellation token every
+    check_every nodes, from whatever thread or process it runs in, without signals
+    :param solve: callable returning the solution, or None if unsatisfiable, and counting its nodes in stats
+    :param stats: Instrumentation of the solve
+    :param seconds: time allowed to the solve, None for no deadline
+    :param cancel: token whose is_set() cancels the solve, None for none
+    :param check_every: number of nodes between two checks
+    :return: SolveResult
+    """
+    stats.deadline = None if seconds is None else time.perf_counter() + seconds
+    stats.cancel = cancel
+    stats.checkEvery = check_every
+
+    try:
+        check_stop(stats)
+        solution = solve()
+        status = 'unsatisfiable' if solution is None else 'solved'
+    except SearchStopped as exc:
+        solution, status = None, exc.args[0]
+    finally:
+        stats.deadline = None
+        stats.cancel = None
+
+    return SolveResult(status, solution, report(stats))
+
+
+def count_wipeout(stats, var):
+    """
+    Records a domain wiped out by propagation
+    :param stats: Instrumentation, or None when not instrumenting
+    :param var: variable whose domain was wiped out
+    :return: None
+    """
+    if stats is not None:
+        stats.wipeouts[var.id] = stats.wipeouts.get(var.id, 0) + 1
+
+
+@contextlib.contextmanager
+def phase(stats, name):
+    """
+    Times a phase of a solve
+    :param stats: Instrumentation, or None when not instrumenting
+    :param name: name of the phase
+    :return: context manager
+    """
+    if stats is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.phases[name] = stats.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def report(stats):
+    """
+    Builds the structured report of an instrumented solve
+    :param stats: Instrumentation
+    :return: dictionary of counters and phase times
+    """
+    elapsed = time.perf_counter() - stats.start
+    return {
+        'nodes': stats.nodes,
+        'backtracks': stats.backtracks,
+        'checks': stats.checks,
+        'wipeouts': sum(stats.wipeouts.values()),
+        'wipeouts_per_word': dict(stats.wipeouts),
+        'max_depth': stats.maxDepth,
+        'restarts': stats.restarts,
+        'phases': dict(stats.phases),
+        'elapsed': elapsed,
+        'nodes_per_second': stats.nodes / elapsed if elapsed > 0 else 0.0,
+    }
@@ -0,0 +1,138 @@
+import numpy as np
+
+# Each letter is coded on LETTER_BITS bits of a uint64, the first letter in the lowest bits, so that words of
+# up to MAX_LENGTH letters fit in one integer and a pattern is checked with one AND and one compare.
+LETTER_BITS = 5
+LETTER_MASK = (1 << LETTER_BITS) - 1
+MAX_LENGTH = 64 // LETTER_BITS
+# code of the bytes that appear in no word
+NO_CODE = 255
+
+
+class PackedDictionary:
+    def __init__(self, codes, words):
+        # letter code by ASCII code, NO_CODE for the bytes of no word
+        self.codes = codes
+        # packed words (uint64) by length, in the order of the word matrices, for the lengths up to MAX_LENGTH
+        self.words = words
+
+
+def letter_codes(dictionary):
+    """
+    Numbers the letters used by a dictionary
+    :param dictionary: numpy word matrices by length
+    :return: numpy array of the letter code by ASCII code, NO_CODE for unused bytes
+    """
+    used = np.zeros(256, dtype=bool)
+    for matrix in dictionary.values():
+        used[np.unique(matrix)] = True
+
+    letters = np.flatnonzero(used)
+    if letters.shape[0] > LETTER_MASK + 1:
+        raise ValueError(f"{letters.shape[0]} letters do not fit in {LETTER_BITS} bits")
+
+    codes = np.full(256, NO_CODE, dtype=np.uint8)
+    codes[letters] = np.arange(letters.shape[0])
+    return codes
+
+
+def pack_words(matrix, codes):
+    """
+    Packs the words of a word matrix
+    :param matrix: numpy word matrix (ASCII codes), at most MAX_LENGTH columns
+    :param codes: letter code by ASCII code
+    :return: numpy array of packed words (uint64)
+    """
+    packed = np.zeros(matrix.shape[0], dtype=np.uint64)
+    for position in range(matrix.shape[1]):
+        packed |= codes[matrix[:, position]].astype(np.uint64) << np.uint64(LETTER_BITS * position)
+    return packed
+
+
+def create_packed_dictionary(dictionary):
+    """
+    Packs the words of a dictionary. Longer words than MAX_LENGTH are left out and keep being matched on
+    their word matrix.
+    :param dictionary: numpy word matrices by length
+    :return: PackedDictionary
+    """
+    codes = letter_codes(dictionary)
+    words = {k: pack_words(v, codes) for k, v in dictionary.items() if k <= MAX_LENGTH}
+    return PackedDictionary(codes, words)
+
+
+def pattern_query(packed, key):
+    """
+    Converts a pattern to the (mask, value) pair its words match
+    :param packed: PackedDictionary
+    :param key: pattern bytes, 0 for a free cell
+    :return: (mask, value) as numpy uint64, or None if a letter of the pattern is in no word
+    """
+    mask = 0
+    value = 0
+    for position, letter in enumerate(key):
+        if letter == 0:
+            continue
+        code = packed.codes[letter]
+        if code == NO_CODE:
+            return None
+        mask |= LETTER_MASK << (LETTER_BITS * position)
+        value |= int(code) << (LETTER_BITS * position)
+    return np.uint64(mask), np.uint64(value)
+
+
+def letter_query(packed, position, letter):
+    """
+    Converts a single letter at a position to the (mask, value) pair its words match
+    :param packed: PackedDictionary
+    :param position: position of the letter in the word
+    :param letter: ASCII code of the letter
+    :return: (mask, value) as numpy uint64, or None if the letter is in no word
+    """
+    code = packed.codes[letter]
+    if code == NO_CODE:
+        return None
+    return np.uint64(LETTER_MASK << (LETTER_BITS * position)), np.uint64(int(code) << (LETTER_BITS * position))
+
+
+def match_ids(packed, length, ids, query):
+    """
+    Filters words by a pattern in one vectorized pass
+    :param packed: PackedDictionary
+    :param length: length of the words
+    :param ids: indexes of the words in the word matrix of the length
+    :param query: (mask, value) from pattern_query, or None
+    :return: boolean mask over ids
+    """
+    if query is None:
+        return np.zeros(ids.shape[0], dtype=bool)
+    mask, value = query
+    return (packed.words[length][ids] & mask) == value
+
+
+def fits(packed, length, value_id, query):
+    """
+    Checks one word against a pattern
+    :param packed: PackedDictionary
+    :param length: length of the word
+    :param value_id: index of the word in the word matrix of the length
+    :param query: (mask, value) from pattern_query, or None
+    :return: Boolean
+    """
+    if query is None:
+        return False
+    mask, value = query
+    return (packed.words[length][value_id] & mask) == value
+
+
+def unpack_word(packed, word, length):
+    """
+    Decodes a packed word
+    :param packed: PackedDictionary
+    :param word: packed word
+    :param length: length of the word
+    :return: list of ASCII codes
+    """
+    letters = np.flatnonzero(packed.codes != NO_CODE)
+    word = int(word)
+    return [int(letters[(word >> (LETTER_BITS * position)) & LETTER_MASK]) for position in range(length)]
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+
+import numpy as np
+
+WILDCARD = '?'
+
+
+class PatternCache:
+    def __init__(self, dictionary, letter_index, max_bytes):
+        self.dictionary = dictionary
+        self.letterIndex = letter_index
+        # matches of the most recently used patterns last, by (length, pattern bytes with 0 for a free cell)
+        self.entries = OrderedDict()
+        self.maxBytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+def create_pattern_cache(dictionary, letter_index, max_bytes=64 << 20):
+    """
+    Creates the pattern cache of a dictionary
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :param max_bytes: memory allowed to the cached matches, the least recently used ones being evicted beyond
+    :return: PatternCache
+    """
+    return PatternCache(dictionary, letter_index, max_bytes)
+
+
+def pattern_key(pattern):
+    """
+    Converts a pattern to its cache key
+    :param pattern: letters of the pattern as stored in the dictionary, WILDCARD for any letter (e.g. 'a??e?')
+    :return: (length, pattern bytes with 0 for a free cell)
+    """
+    return len(pattern), pattern.replace(WILDCARD, '\0').encode('Windows-1252')
+
+
+def compute_mask(cache, length, key):
+    """
+    Finds the words of a length matching a pattern
+    :param cache: PatternCache
+    :param length: length of the pattern
+    :param key: pattern bytes, 0 for a free cell
+    :return: boolean mask over the word matrix of the length
+    """
+    count = cache.dictionary[length].shape[0]
+    index = cache.letterIndex[length]
+    mask = np.ones(count, dtype=bool)
+
+    for position, letter in enumerate(key):
+        if letter == 0:
+            continue
+        bitset = index.get((position, letter))
+        if bitset is None:
+            return np.zeros(count, dtype=bool)
+        mask &= bitset
+
+    return mask
+
+
+def pattern_mask(cache, length, key):
+    """
+    Gets the words of a length matching a pattern, from the cache when possible
+    :param cache: PatternCache
+    :param length: length of the pattern
+    :param key: pattern bytes, 0 for a free cell
+    :return: read-only boolean mask over the word matrix of the length
+    """
+    entries = cache.entries
+    mask = entries.get((length, key))
+    if mask is not None:
+        cache.hits += 1
+        entries.move_to_end((length, key))
+        return mask
+
+    cache.misses += 1
+    mask = compute_mask(cache, length, key)
+    mask.flags.writeable = False
+    if mask.nbytes > cache.maxBytes:
+        return mask
+
+    entries[(length, key)] = mask
+    cache.bytes += mask.nbytes
+    while cache.bytes > cache.maxBytes:
+        _, evicted = entries.popitem(last=False)
+        cache.bytes -= evicted.nbytes
+        cache.evictions += 1
+
+    return mask
+
+
+def match_pattern(cache, pattern):
+    """
+    Finds the candidate words of a pattern
+    :param cache: PatternCache
+    :param pattern: letters of the pattern as stored in the dictionary, WILDCARD for any letter (e.g. 'a??e?')
+    :return: indexes of the matching words in the word matrix of the pattern length, increasing
+    """
+    length, key = pattern_key(pattern)
+    if length not in cache.dictionary:
+        return np.zeros(0, dtype=np.intp)
+    return np.flatnonzero(pattern_mask(cache, length, key))
+
+
+def match_words(cache, pattern):
+    """
+    Lists the words matching a pattern
+    :param cache: PatternCache
+    :param pattern: letters of the pattern as stored in the dictionary, WILDCARD for any letter (e.g. 'a??e?')
+    :return: list of matching words
+    """
+    ids = match_pattern(cache, pattern)
+    if ids.shape[0] == 0:
+        return []
+    return [word.tobytes().decode('Windows-1252') for word in cache.dictionary[len(pattern)][ids]]
+
+
+def cache_stats(cache):
+    """
+    Builds the statistics of a pattern cache
+    :param cache: PatternCache
+    :return: dictionary of hits, misses, hit rate, evictions, entries and memory
+    """
+    lookups = cache.hits + cache.misses
+    return {
+        'hits': cache.hits,
+        'misses': cache.misses,
+        'hit_rate': cache.hits / lookups if lookups else 0.0,
+        'evictions': cache.evictions,
+        'entries': len(cache.entries),
+        'bytes': cache.bytes,
+        'max_bytes': cache.maxBytes,
+    }
@@ -0,0 +1,516 @@
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import time
+
+import numpy as np
+
+import forward_checking
+import instrumentation
+import pattern_cache
+import shared_dictionary
+import variable_ordering
+
+# Protocol: one JSON object per line in each direction.
+#   {"op": "solve", "grid": ["00#", ...], "dictionary": ..., "deadline": seconds, "progress": seconds,
+#    "ac3": ..., "cbj": ..., "restarts": ..., "ordering": ..., "lcv": ..., "seed": ...}
+#   {"op": "cancel", "job": job ID}
+#   {"op": "stats"}
+# A solve is answered with events {"job": job ID, "status": ...}: queued, running, progress (with the search
+# counters), then one of solved (with the grid), unsatisfiable, timeout, cancelled or error.
+FINAL_STATUSES = ('solved', 'unsatisfiable', 'timeout', 'cancelled', 'error')
+# longest request line accepted, large grids included
+LINE_LIMIT = 1 << 24
+# seconds between two checks that the worker processes are alive
+WATCH_INTERVAL = 0.5
+
+
+class Job:
+    def __init__(self, job_id, request, writer, deadline):
+        self.id = job_id
+        self.request = request
+        self.writer = writer
+        # absolute time.time() after which the job is stopped, None for no deadline
+        self.deadline = deadline
+        self.status = 'queued'
+        self.worker = None
+
+
+class Worker:
+    def __init__(self, process, tasks, cancel):
+        self.process = process
+        self.tasks = tasks
+        # set by the server to stop the job running on this worker
+        self.cancel = cancel
+        self.job = None
+
+
+class SolveServer:
+    def __init__(self, dictionary_names, shared, handles):
+        self.dictionaryNames = dictionary_names
+        self.shared = shared
+        self.handles = handles
+        self.jobs = {}
+        self.jobIds = itertools.count(1)
+        # jobs waiting for a worker, earliest deadline first
+        self.pending = asyncio.PriorityQueue()
+        self.idle = asyncio.Queue()
+        self.workers = []
+        # (job ID, event) sent by the workers
+        self.events = multiprocessing.Queue()
+
+
+def grid_rows(crossword):
+    """
+    Formats a solved crossword for a client
+    :param crossword: crossword puzzle
+    :return: list of rows, '#' for a block
+    """
+    return [row.tobytes().decode('Windows-1252') for row in crossword]
+
+
+def run_job(job_id, request, deadline, dictionaries, cancel, events):
+    """
+    Solves the crossword of a job in a worker, streaming progress events
+    :param job_id: job ID
+    :param request: solve request
+    :param deadline: absolute time after which the job is stopped, None for no deadline
+    :param dictionaries: attached dictionaries and their pattern caches by name
+    :param cancel: multiprocessing event set to cancel the job
+    :param events: multiprocessing queue receiving (job ID, event)
+    :return: final event
+    """
+    def progress(report):
+        events.put((job_id, {'status': 'progress', 'nodes': report['nodes'], 'backtracks': report['backtracks'],
+                             'max_depth': report['max_depth'], 'elapsed': report['elapsed']}))
+
+    stats = instrumentation.Instrumentation(0, request.get('progress') or 0.0, progress)
+    seed = request.get('seed')
+
+    try:
+        dictionary, letter_index, _, patterns = dictionaries[request['dictionary']]
+        crossword = forward_checking.parse_crossword(request['grid'])
+        result = forward_checking.solve_stoppable(crossword, dictionary, letter_index,
+                                                  None if deadline is None else deadline - time.time(), cancel,
+                                                  ac3=request.get('ac3', True), cbj=request.get('cbj', False),
+                                                  rng=None if seed is None else np.random.default_rng(seed),
+                                                  stats=stats, restarts=request.get('restarts'),
+                                                  ordering=request.get('ordering', 'mrv'),
+                                                  lcv=request.get('lcv', False), patterns=patterns)
+        event = {'status': result.status}
+        if result.status == 'solved':
+            event['grid'] = grid_rows(result.solution)
+    except Exception as exc:
+        event = {'status': 'error', 'error': f'{type(exc).__name__}: {exc}'}
+
+    event['nodes'] = stats.nodes
+    event['elapsed'] = time.perf_counter() - stats.start
+    return event
+
+
+def worker_loop(shared, tasks, cancel, events):
+    """
+    Runs the jobs sent to a worker process until it receives None
+    :param shared: descriptions of the shared dictionaries by name
+    :param tasks: multiprocessing queue of (job ID, request, deadline)
+    :param cancel: multiprocessing event set to cancel the running job
+    :param events: multiprocessing queue receiving (job ID, event)
+    :return: None
+    """
+    # the server handles Ctrl-C for the whole process group and stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    dictionaries = {}
+    for name, description in shared.items():
+        dictionary, letter_index, handles = shared_dictionary.attach_dictionary(description)
+        patterns = pattern_cache.create_pattern_cache(dictionary, letter_index)
+        dictionaries[name] = (dictionary, letter_index, handles, patterns)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, request, deadline = task
+        events.put((job_id, {'status': 'running'}))
+        events.put((job_id, run_job(job_id, request, deadline, dictionaries, cancel, events)))
+
+
+def send(writer, event):
+    """
+    Writes an event to a client, ignoring clients that went away
+    :param writer: asyncio stream writer
+    :param event: JSON-serializable event
+    :return: None
+    """
+    if writer.is_closing():
+        return
+    writer.write((json.dumps(event) + '\n').encode())
+
+
+def finish_job(server, job, event):
+    """
+    Sends the final event of a job and forgets it
+    :param server: SolveServer
+    :param job: Job
+    :param event: final event
+    :return: None
+    """
+    job.status = event['status']
+    send(job.writer, dict(event, job=job.id))
+    server.jobs.pop(job.id, None)
+
+
+def is_number(value):
+    """
+    Checks that a request field is a JSON number
+    :param value: field value
+    :return: Boolean
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def request_error(request):
+    """
+    Validates the fields of a solve request before it reaches a worker
+    :param request: decoded solve request
+    :return: error message, or None if the request is valid
+    """
+    grid = request.get('grid')
+    if not isinstance(grid, list) or not all(isinstance(row, str) for row in grid):
+        return 'grid must be a list of rows'
+    for name in ('deadline', 'progress'):
+        value = request.get(name)
+        if value is not None and (not is_number(value) or value < 0):
+            return f'{name} must be a non-negative number of seconds'
+    if 'dictionary' in request and not isinstance(request['dictionary'], str):
+        return 'dictionary must be a string'
+    for name in ('ac3', 'cbj', 'lcv'):
+        if not isinstance(request.get(name, False), bool):
+            return f'{name} must be a boolean'
+    seed = request.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+        return 'seed must be a non-negative integer'
+    if request.get('restarts') not in (None, 'luby', 'geometric'):
+        return "restarts must be 'luby' or 'geometric'"
+    if request.get('ordering', 'mrv') not in variable_ordering.STRATEGIES:
+        return f'ordering must be one of {", ".join(variable_ordering.STRATEGIES)}'
+    return None
+
+
+def submit_job(server, request, writer):
+    """
+    Queues a solve request
+    :param server: SolveServer
+    :param request: solve request
+    :param writer: stream writer of the client
+    :return: Job
+    """
+    request.setdefault('dictionary', server.dictionaryNames[0])
+    seconds = request.get('deadline')
+    job = Job(str(next(server.jobIds)), request, writer, None if seconds is None else time.time() + seconds)
+    server.jobs[job.id] = job
+    send(writer, {'job': job.id, 'status': 'queued'})
+
+    if request['dictionary'] not in server.shared:
+        finish_job(server, job, {'status': 'error', 'error': f"unknown dictionary {request['dictionary']!r}"})
+    else:
+        server.pending.put_nowait((float('inf') if job.deadline is None else job.deadline, int(job.id), job))
+    return job
+
+
+def cancel_job(server, job):
+    """
+    Cancels a queued or running job
+    :param server: SolveServer
+    :param job: Job
+    :return: None
+    """
+    if job.status == 'queued':
+        finish_job(server, job, {'status': 'cancelled'})
+    elif job.status == 'running':
+        job.worker.cancel.set()
+
+
+async def dispatch_jobs(server):
+    """
+    Hands the queued jobs to idle workers, earliest deadline first
+    :param server: SolveServer
+    :return: None
+    """
+    while True:
+        _, _, job = await server.pending.get()
+        if job.status != 'queued':
+            continue
+        worker = await server.idle.get()
+        # a worker that died while idle is replaced by watch_workers
+        while not worker.process.is_alive():
+            worker = await server.idle.get()
+
+        # the job may have been cancelled or run out of time while waiting for a worker
+        if job.status != 'queued':
+            server.idle.put_nowait(worker)
+            continue
+        if job.deadline is not None and time.time() >= job.deadline:
+            server.idle.put_nowait(worker)
+            finish_job(server, job, {'status': 'timeout'})
+            continue
+
+        worker.cancel.clear()
+        worker.job = job
+        job.worker = worker
+        job.status = 'running'
+        worker.tasks.put((job.id, job.request, job.deadline))
+
+
+async def collect_events(server):
+    """
+    Forwards the events of the workers to the clients and frees the workers of finished jobs
+    :param server: SolveServer
+    :return: None
+    """
+    loop = asyncio.get_running_loop()
+
+    while True:
+        job_id, event = await loop.run_in_executor(None, server.events.get)
+        if event is None:
+            return
+        job = server.jobs.get(job_id)
+        if job is None:
+            continue
+
+        if event['status'] in FINAL_STATUSES:
+            worker = job.worker
+            worker.job = None
+            finish_job(server, job, event)
+            server.idle.put_nowait(worker)
+        elif event['status'] != 'running':
+            send(job.writer, dict(event, job=job.id))
+
+
+async def watch_workers(server):
+    """
+    Replaces the worker processes that died (killed by a signal, out of memory...), failing the job they were
+    running
+    :param server: SolveServer
+    :return: None
+    """
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL)
+        for worker in list(server.workers):
+            if worker.process.exitcode is None:
+                continue
+            server.workers.remove(worker)
+            job = worker.job
+            if job is not None and job.id in server.jobs:
+                finish_job(server, job, {'status': 'error',
+                                         'error': f'worker process died (exit code {worker.process.exitcode})'})
+            start_worker(server)
+
+
+async def handle_client(server, reader, writer):
+    """
+    Serves the requests of a client connection. The jobs of a client are cancelled when it disconnects.
+    :param server: SolveServer
+    :param reader: asyncio stream reader
+    :param writer: asyncio stream writer
+    :return: None
+    """
+    submitted = []
+
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # the rest of the line is still unread, so the connection cannot be resynchronized
+                send(writer, {'status': 'error', 'error': f'request longer than {LINE_LIMIT} bytes'})
+                break
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except ValueError:
+                send(writer, {'status': 'error', 'error': 'invalid JSON'})
+                continue
+            if not isinstance(request, dict):
+                send(writer, {'status': 'error', 'error': 'request must be a JSON object'})
+                continue
+
+            op = request.get('op')
+            if op == 'solve':
+                error = request_error(request)
+                if error is not None:
+                    send(writer, {'status': 'error', 'error': error})
+                    continue
+                submitted.append(submit_job(server, request, writer))
+            elif op == 'cancel':
+                job = server.jobs.get(str(request.get('job')))
+                if job is None:
+                    send(writer, {'job': request.get('job'), 'status': 'error', 'error': 'unknown job'})
+                else:
+                    cancel_job(server, job)
+            elif op == 'stats':
+                running = sum(worker.job is not None for worker in server.workers)
+                send(writer, {'status': 'stats', 'jobs': len(server.jobs), 'running': running,
+                              'workers': len(server.workers), 'dictionaries': server.dictionaryNames})
+            else:
+                send(writer, {'status': 'error', 'error': f'unknown op {op!r}'})
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        for job in submitted:
+            if job.id in server.jobs:
+                cancel_job(server, job)
+        writer.close()
+
+
+def start_workers(server, count):
+    """
+    Starts the worker processes, each mapping the shared dictionaries
+    :param server: SolveServer
+    :param count: number of worker processes
+    :return: None
+    """
+    for _ in range(count):
+        start_worker(server)
+
+
+def start_worker(server):
+    """
+    Starts a worker process mapping the shared dictionaries and makes it available for jobs
+    :param server: SolveServer
+    :return: Worker
+    """
+    tasks = multiprocessing.Queue()
+    cancel = multiprocessing.Event()
+    process = multiprocessing.Process(target=worker_loop, args=(server.shared, tasks, cancel, server.events),
+                                      daemon=True)
+    process.start()
+    worker = Worker(process, tasks, cancel)
+    server.workers.append(worker)
+    server.idle.put_nowait(worker)
+    return worker
+
+
+def stop_workers(server):
+    """
+    Stops the worker processes and frees the shared dictionaries
+    :param server: SolveServer
+    :return: None
+    """
+    for worker in server.workers:
+        worker.cancel.set()
+        worker.tasks.put(None)
+    for worker in server.workers:
+        worker.process.join(1)
+        if worker.process.is_alive():
+            worker.process.kill()
+    # wakes up collect_events, blocked on the queue in an executor thread
+    server.events.put((None, None))
+    shared_dictionary.release_dictionary(server.handles)
+
+
+async def serve(dictionary_names, workers=None, socket_path='crossword.sock', port=None):
+    """
+    Runs the solve server until interrupted. Dictionaries are loaded once and shared with the workers.
+    :param dictionary_names: names of the dictionary text files, the first one being the default
+    :param workers: number of worker processes, one per core by default
+    :param socket_path: path of the Unix socket to listen on
+    :param port: TCP port to listen on (localhost only) instead of the Unix socket, None to use the socket
+    :return: None
+    """
+    shared = {}
+    handles = []
+    for name in dictionary_names:
+        description, blocks = shared_dictionary.share_dictionary(*forward_checking.fill_dict(name))
+        shared[name] = description
+        handles.extend(blocks)
+
+    server = SolveServer(list(dictionary_names), shared, handles)
+    start_workers(server, workers or multiprocessing.cpu_count())
+    tasks = [asyncio.create_task(dispatch_jobs(server)), asyncio.create_task(collect_events(server)),
+             asyncio.create_task(watch_workers(server))]
+
+    def client(reader, writer):
+        return handle_client(server, reader, writer)
+
+    if port is None:
+        listener = await asyncio.start_unix_server(client, socket_path, limit=LINE_LIMIT)
+        os.chmod(socket_path, 0o600)
+    else:
+        listener = await asyncio.start_server(client, '127.0.0.1', port, limit=LINE_LIMIT)
+
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        stop_workers(server)
+        if port is None and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+async def request_solve(grid_name, socket_path='crossword.sock', port=None, **options):
+    """
+    Client: submits a crossword file to a running server and prints its events
+    :param grid_name: Name of crossword text file
+    :param socket_path: path of the server Unix socket
+    :param port: TCP port of the server, None to use the socket
+    :param options: solve options of the request (deadline, progress, ac3, ...)
+    :return: final event
+    """
+    if port is None:
+        reader, writer = await asyncio.open_unix_connection(socket_path, limit=LINE_LIMIT)
+    else:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=LINE_LIMIT)
+
+    with open(grid_name) as file:
+        grid = [line.strip() for line in file if line.strip()]
+    writer.write((json.dumps(dict(options, op='solve', grid=grid)) + '\n').encode())
+    await writer.drain()
+
+    try:
+        while True:
+            event = json.loads(await reader.readline())
+            print(json.dumps(event))
+            if event['status'] in FINAL_STATUSES:
+                return event
+    finally:
+        writer.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local crossword solve server')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='run the server')
+    serve_parser.add_argument('dictionaries', nargs='+')
+    serve_parser.add_argument('--workers', type=int, default=None)
+
+    solve_parser = subparsers.add_parser('solve', help='submit a crossword to a running server')
+    solve_parser.add_argument('crossword')
+    solve_parser.add_argument('--dictionary', default=None)
+    solve_parser.add_argument('--deadline', type=float, default=None)
+    solve_parser.add_argument('--progress', type=float, default=1.0)
+    solve_parser.add_argument('--cbj', action='store_true')
+
+    for subparser in (serve_parser, solve_parser):
+        subparser.add_argument('--socket', default='crossword.sock')
+        subparser.add_argument('--port', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.dictionaries, args.workers, args.socket, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        options = {'deadline': args.deadline, 'progress': args.progress, 'cbj': args.cbj}
+        if args.dictionary is not None:
+            options['dictionary'] = args.dictionary
+        asyncio.run(request_solve(args.crossword, args.socket, args.port, **options))
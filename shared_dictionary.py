@@ -0,0 +1,82 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def share_array(array, handles):
+    """
+    Copies a numpy array into a new shared memory block
+    :param array: numpy array
+    :param handles: list collecting the shared memory blocks
+    :return: description of the shared array (name, shape, dtype)
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    handles.append(shm)
+    return shm.name, array.shape, array.dtype.str
+
+
+def attach_array(description, handles):
+    """
+    Maps a shared array into this process without copying it
+    :param description: description of the shared array from share_array
+    :param handles: list collecting the shared memory blocks
+    :return: read-only numpy array backed by the shared memory block
+    """
+    name, shape, dtype = description
+    shm = shared_memory.SharedMemory(name=name)
+    handles.append(shm)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.flags.writeable = False
+    return array
+
+
+def share_dictionary(dictionary, letter_index):
+    """
+    Copies the word matrices and the positional letter index of a dictionary into shared memory, so that
+    worker processes can map them instead of receiving a pickled copy
+    :param dictionary: numpy word matrices by length
+    :param letter_index: positional letter index by length
+    :return: (description of the shared dictionary, list of shared memory blocks)
+    """
+    handles = []
+    description = {}
+
+    for k, v in dictionary.items():
+        keys = sorted(letter_index[k])
+        if keys:
+            bitsets = np.stack([letter_index[k][key] for key in keys])
+        else:
+            bitsets = np.zeros((0, v.shape[0]), dtype=bool)
+        description[k] = (share_array(v, handles), keys, share_array(bitsets, handles))
+
+    return description, handles
+
+
+def attach_dictionary(description):
+    """
+    Maps a dictionary shared by share_dictionary into this process
+    :param description: description of the shared dictionary
+    :return: (numpy word matrices by length, positional letter index by length, list of shared memory blocks)
+    """
+    handles = []
+    dictionary = {}
+    letter_index = {}
+
+    for k, (words, keys, bitsets) in description.items():
+        dictionary[k] = attach_array(words, handles)
+        bitsets = attach_array(bitsets, handles)
+        letter_index[k] = {key: bitsets[i] for i, key in enumerate(keys)}
+
+    return dictionary, letter_index, handles
+
+
+def release_dictionary(handles):
+    """
+    Closes and frees the shared memory blocks created by share_dictionary
+    :param handles: list of shared memory blocks
+    :return: None
+    """
+    for shm in handles:
+        shm.close()
+        shm.unlink()
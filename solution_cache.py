@@ -0,0 +1,217 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# Layout of a cache entry: MAGIC, rows and columns of the grid (2 bytes each, little endian), then the fills,
+# one grid after the other in the canonical orientation of the puzzle (see canonical_grid).
+MAGIC = b'CWFILL01'
+HEADER_SIZE = len(MAGIC) + 4
+SUFFIX = '.fill'
+
+
+class SolutionCache:
+    def __init__(self, directory, max_bytes, max_fills):
+        self.directory = directory
+        # size of the entries allowed on disk, the least recently used ones being evicted beyond
+        self.maxBytes = max_bytes
+        # fills kept per puzzle, the oldest ones being dropped beyond
+        self.maxFills = max_fills
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+def create_solution_cache(directory='solutions', max_bytes=64 << 20, max_fills=8):
+    """
+    Creates the on-disk solution cache of a directory. Several processes may use the same directory: entries
+    are written next to their final path and renamed into place, so readers never see a partial entry.
+    :param directory: directory of the cache entries, created if missing
+    :param max_bytes: size of the entries allowed on disk
+    :param max_fills: fills kept per puzzle
+    :return: SolutionCache
+    """
+    os.makedirs(directory, exist_ok=True)
+    return SolutionCache(directory, max_bytes, max_fills)
+
+
+def dictionary_fingerprint(dictionary):
+    """
+    Identifies the contents of a dictionary
+    :param dictionary: numpy word matrices by length
+    :return: hex digest of the word matrices
+    """
+    digest = hashlib.sha256()
+    for k, v in sorted(dictionary.items()):
+        digest.update(k.to_bytes(4, 'little'))
+        digest.update(v.shape[0].to_bytes(4, 'little'))
+        digest.update(np.ascontiguousarray(v).data)
+    return digest.hexdigest()
+
+
+def canonical_grid(crossword):
+    """
+    Picks the orientation a puzzle is cached in. Transposing a grid swaps its horizontal and vertical words,
+    so a fill of one orientation is a fill of the other; other symmetries would reverse the words.
+    :param crossword: crossword puzzle
+    :return: (canonical grid, True if it is the transpose of the crossword)
+    """
+    transposed = crossword.T
+    if (transposed.shape, transposed.tobytes()) < (crossword.shape, crossword.tobytes()):
+        return np.ascontiguousarray(transposed), True
+    return crossword, False
+
+
+def entry_path(cache, grid, fingerprint, all_different):
+    """
+    Gets the path of the entry of a puzzle
+    :param cache: SolutionCache
+    :param grid: canonical grid of the puzzle
+    :param fingerprint: fingerprint of the dictionary
+    :param all_different: whether the fills may not repeat a word
+    :return: path of the entry
+    """
+    digest = hashlib.sha256()
+    digest.update(np.array(grid.shape, dtype=np.uint16).tobytes())
+    digest.update(grid.tobytes())
+    digest.update(fingerprint.encode())
+    digest.update(b'\1' if all_different else b'\0')
+    return os.path.join(cache.directory, digest.hexdigest() + SUFFIX)
+
+
+def read_entry(path, shape):
+    """
+    Reads the fills of an entry
+    :param path: path of the entry
+    :param shape: shape of the canonical grid
+    :return: list of fills, empty if the entry is missing, truncated or not a cache entry of the grid
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return []
+
+    if data[:len(MAGIC)] != MAGIC or len(data) < HEADER_SIZE or (int.from_bytes(data[8:10], 'little'),
+                                                                 int.from_bytes(data[10:12], 'little')) != shape:
+        return []
+    if (len(data) - HEADER_SIZE) % (shape[0] * shape[1]):
+        return []
+    return list(np.frombuffer(data, dtype=np.uint8, offset=HEADER_SIZE).reshape((-1,) + shape))
+
+
+def write_entry(path, shape, fills):
+    """
+    Writes the fills of an entry, atomically
+    :param path: path of the entry
+    :param shape: shape of the canonical grid
+    :param fills: list of fills
+    :return: None
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(MAGIC)
+            file.write(shape[0].to_bytes(2, 'little'))
+            file.write(shape[1].to_bytes(2, 'little'))
+            for fill in fills:
+                file.write(fill.tobytes())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+
+def lookup_fills(cache, crossword, fingerprint, all_different=True):
+    """
+    Gets the cached fills of a puzzle. A hit marks the entry as recently used.
+    :param cache: SolutionCache
+    :param crossword: crossword puzzle
+    :param fingerprint: fingerprint of the dictionary
+    :param all_different: whether the fills may not repeat a word
+    :return: list of solved crosswords, oldest first, in the orientation of the crossword
+    """
+    grid, transposed = canonical_grid(crossword)
+    path = entry_path(cache, grid, fingerprint, all_different)
+    fills = read_entry(path, grid.shape)
+
+    if not fills:
+        cache.misses += 1
+        return []
+
+    cache.hits += 1
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return [fill.T if transposed else fill for fill in fills]
+
+
+def store_fill(cache, crossword, fingerprint, solution, all_different=True):
+    """
+    Adds a fill of a puzzle to the cache, then evicts the least recently used entries beyond the size of the
+    cache. Two processes storing a fill of the same puzzle at once may keep only one of them.
+    :param cache: SolutionCache
+    :param crossword: crossword puzzle
+    :param fingerprint: fingerprint of the dictionary
+    :param solution: solved crossword
+    :param all_different: whether the fill repeats no word
+    :return: None
+    """
+    grid, transposed = canonical_grid(crossword)
+    fill = np.ascontiguousarray(solution.T if transposed else solution)
+    path = entry_path(cache, grid, fingerprint, all_different)
+
+    fills = read_entry(path, grid.shape)
+    if any(np.array_equal(fill, known) for known in fills):
+        return
+    write_entry(path, grid.shape, (fills + [fill])[-cache.maxFills:])
+    evict(cache)
+
+
+def evict(cache):
+    """
+    Removes the least recently used entries until the cache fits in its size
+    :param cache: SolutionCache
+    :return: None
+    """
+    entries = []
+    total = 0
+    with os.scandir(cache.directory) as listing:
+        for entry in listing:
+            if not entry.name.endswith(SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= cache.maxBytes:
+            break
+        try:
+            os.unlink(path)
+            cache.evictions += 1
+        except OSError:
+            pass
+        total -= size
+
+
+def cache_stats(cache):
+    """
+    Builds the statistics of a solution cache
+    :param cache: SolutionCache
+    :return: dictionary of hits, misses, hit rate and evictions of this process
+    """
+    lookups = cache.hits + cache.misses
+    return {
+        'hits': cache.hits,
+        'misses': cache.misses,
+        'hit_rate': cache.hits / lookups if lookups else 0.0,
+        'evictions': cache.evictions,
+    }
@@ -0,0 +1,61 @@
+import os
+
+import compiled_dictionary
+
+
+def words_of(dictionary):
+    return {word.tobytes().decode() for matrix in dictionary.values() for word in matrix}
+
+
+def test_rebuilds_when_the_source_changes(tmp_path):
+    path = tmp_path / 'words.txt'
+    path.write_text('cat\ndog\n')
+    dictionary, letter_index = compiled_dictionary.load_dictionary(str(path))
+    assert words_of(dictionary) == {'cat', 'dog'}
+
+    path.write_text('cat\ndog\nmouse\n')
+    dictionary, letter_index = compiled_dictionary.load_dictionary(str(path))
+    assert words_of(dictionary) == {'cat', 'dog', 'mouse'}
+    assert letter_index[5][(0, ord('m'))].tolist() == [True]
+    header, _ = compiled_dictionary.read_header(compiled_dictionary.cache_path_for(str(path)))
+    assert header['source'] == compiled_dictionary.source_fingerprint(str(path))
+
+
+def test_reuses_the_compiled_dictionary(tmp_path):
+    path = tmp_path / 'words.txt'
+    path.write_text('cat\ndog\n')
+    compiled_dictionary.load_dictionary(str(path))
+    cache_path = compiled_dictionary.cache_path_for(str(path))
+    mtime = os.stat(cache_path).st_mtime_ns
+
+    dictionary, _ = compiled_dictionary.load_dictionary(str(path))
+    assert os.stat(cache_path).st_mtime_ns == mtime
+    assert not dictionary[3].flags.writeable
+
+
+def test_falls_back_to_parsing_when_read_only(tmp_path, monkeypatch):
+    path = tmp_path / 'words.txt'
+    path.write_text('cat\ndog\n')
+
+    def write_compiled(*args):
+        raise PermissionError('read-only')
+
+    monkeypatch.setattr(compiled_dictionary, 'write_compiled', write_compiled)
+    dictionary, letter_index = compiled_dictionary.load_dictionary(str(path))
+    assert words_of(dictionary) == {'cat', 'dog'}
+    assert letter_index[3][(0, ord('c'))].tolist() == [True, False]
+    assert not os.path.exists(compiled_dictionary.cache_path_for(str(path)))
+
+
+def test_falls_back_to_parsing_when_removed_after_writing(tmp_path, monkeypatch):
+    path = tmp_path / 'words.txt'
+    path.write_text('cat\ndog\n')
+    write_compiled = compiled_dictionary.write_compiled
+
+    def write_then_remove(cache_path, *args):
+        write_compiled(cache_path, *args)
+        os.remove(cache_path)
+
+    monkeypatch.setattr(compiled_dictionary, 'write_compiled', write_then_remove)
+    dictionary, _ = compiled_dictionary.load_dictionary(str(path))
+    assert words_of(dictionary) == {'cat', 'dog'}
@@ -0,0 +1,129 @@
+import random
+
+import numpy as np
+import pytest
+
+import benchmark
+import forward_checking
+import instrumentation
+import packed_words
+import pattern_cache
+
+
+@pytest.fixture(scope='module')
+def dictionary(tmp_path_factory):
+    with open('words.txt') as f:
+        words = f.read().split()
+    path = tmp_path_factory.mktemp('dictionary') / 'words.txt'
+    path.write_text('\n'.join(random.Random(0).sample(words, 3000)) + '\n')
+    return forward_checking.fill_dict(str(path))
+
+
+def fill_words(crossword, solved):
+    """
+    Reads the words of a solved crossword
+    :param crossword: crossword puzzle
+    :param solved: solved crossword
+    :return: list of words, one per slot
+    """
+    words = []
+    for word in forward_checking.create_words(crossword.copy()):
+        words.append(''.join(chr(solved[cell]) for cell in forward_checking.word_cells(word)))
+    return words
+
+
+def grids():
+    for size in (4, 5, 6, 7):
+        for density in (0.2, 0.3):
+            for seed in range(4):
+                yield benchmark.generate_grid(size, density, seed)
+
+
+@pytest.mark.parametrize('all_different', [True, False])
+@pytest.mark.parametrize('restarts', [None, 'luby'])
+def test_cbj_agrees_with_forward_checking(dictionary, all_different, restarts):
+    matrices, letter_index = dictionary
+    vocabulary = {''.join(map(chr, row)) for matrix in matrices.values() for row in matrix}
+    for crossword in grids():
+        expected = forward_checking.solve_crossword(crossword, matrices, letter_index,
+                                                    all_different=all_different)
+        solved = forward_checking.solve_crossword(crossword, matrices, letter_index, cbj=True, restarts=restarts,
+                                                  rng=np.random.default_rng(0), all_different=all_different)
+        assert (solved is None) == (expected is None)
+        if solved is None:
+            continue
+        assert np.array_equal(solved == 35, crossword == 35)
+        words = fill_words(crossword, solved)
+        assert set(words) <= vocabulary
+        if all_different:
+            assert len(set(words)) == len(words)
+
+
+def test_hand_off_values_partitions_the_search(dictionary):
+    matrices, letter_index = dictionary
+    crossword = benchmark.generate_grid(4, 0.2, 0)
+    expected = sorted(s.tobytes() for s in forward_checking.iter_solutions(crossword, matrices, letter_index,
+                                                                           unique=False))
+    assert len(expected) > 1
+
+    grid = crossword.copy()
+    words = forward_checking.create_words(grid)
+    domains, words = forward_checking.create_domains(matrices, letter_index, words, np.random.default_rng(0))
+    trail = forward_checking.create_trail(words)
+    trail.choices = []
+    handed = []
+    stats = instrumentation.Instrumentation(5)
+    stats.hooks.append(lambda stats, depth: handed.extend(forward_checking.hand_off_values((), trail.choices)))
+
+    solutions = [s.tobytes() for s in forward_checking.search_solutions(words, domains, grid, stats=stats,
+                                                                        trail=trail)]
+    assert handed
+    trail.choices = None
+    for prefix in handed:
+        forward_checking.reset_words(words, grid, trail)
+        lvna = forward_checking.apply_prefix(words, domains, grid, trail, prefix)
+        if lvna is not None:
+            solutions += [s.tobytes() for s in forward_checking.search_solutions(lvna, domains, grid, trail=trail)]
+    assert sorted(solutions) == expected
+
+
+def solvers(dictionary):
+    matrices, letter_index = dictionary
+    patterns = pattern_cache.create_pattern_cache(matrices, letter_index)
+    packed = packed_words.create_packed_dictionary(matrices)
+    yield lambda c: forward_checking.solve_crossword(c, matrices, letter_index, all_different=False)
+    yield lambda c: forward_checking.solve_crossword(c, matrices, letter_index, ac3=True, all_different=False)
+    yield lambda c: forward_checking.solve_crossword(c, matrices, letter_index, patterns=patterns,
+                                                     all_different=False)
+    yield lambda c: forward_checking.solve_crossword(c, matrices, letter_index, packed=packed, all_different=False)
+    yield lambda c: forward_checking.solve_crossword(c, matrices, letter_index, cbj=True, all_different=False)
+    yield lambda c: forward_checking.solve_crossword(c, matrices, letter_index, restarts='luby',
+                                                     all_different=False)
+    yield lambda c: forward_checking.solve_decomposed(c, matrices, letter_index, all_different=False)
+    yield lambda c: forward_checking.anytime_solve(c, matrices, letter_index, nodes=1000, all_different=False)[0]
+    yield lambda c: forward_checking.stealing_solve(c, matrices, letter_index, 2, all_different=False)
+
+
+@pytest.mark.parametrize('words, satisfiable', [(['a-', 'b-'], False), (['a-', '-1', '--'], True)])
+def test_crossings_on_non_letters(tmp_path, words, satisfiable):
+    path = tmp_path / 'words.txt'
+    path.write_text('\n'.join(words) + '\n')
+    dictionary = forward_checking.fill_dict(str(path))
+    crossword = forward_checking.parse_crossword(['00', '00'])
+
+    for solve in solvers(dictionary):
+        solved = solve(crossword)
+        assert (solved is not None) == satisfiable
+        if solved is not None:
+            assert set(fill_words(crossword, solved)) <= set(words)
+
+
+def test_iter_solutions_limit(dictionary):
+    matrices, letter_index = dictionary
+    crossword = benchmark.generate_grid(4, 0.2, 0)
+    stats = instrumentation.Instrumentation()
+    assert list(forward_checking.iter_solutions(crossword, matrices, letter_index, 0, stats=stats)) == []
+    assert stats.nodes == 0
+    assert len(list(forward_checking.iter_solutions(crossword, matrices, letter_index, 2))) == 2
+    with pytest.raises(ValueError):
+        next(forward_checking.iter_solutions(crossword, matrices, letter_index, -1))
@@ -0,0 +1,91 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+import benchmark
+import forward_checking
+import solution_cache
+
+
+@pytest.fixture(scope='module')
+def dictionary(tmp_path_factory):
+    with open('words.txt') as f:
+        words = f.read().split()
+    path = tmp_path_factory.mktemp('dictionary') / 'words.txt'
+    path.write_text('\n'.join(random.Random(0).sample(words, 3000)) + '\n')
+    return forward_checking.fill_dict(str(path))
+
+
+def fill(shape, value):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_hit_on_transposed_grid(tmp_path, dictionary):
+    matrices, letter_index = dictionary
+    cache = solution_cache.create_solution_cache(str(tmp_path))
+    crossword = benchmark.generate_grid(4, 0.2, 0)
+
+    solved = forward_checking.solve_cached(cache, crossword, matrices, letter_index)
+    assert cache.misses == 1
+    cached = forward_checking.solve_cached(cache, np.ascontiguousarray(crossword.T), matrices, letter_index)
+    assert cache.hits == 1
+    assert np.array_equal(cached, solved.T)
+
+
+def test_fresh_returns_a_new_fill(tmp_path, dictionary):
+    matrices, letter_index = dictionary
+    cache = solution_cache.create_solution_cache(str(tmp_path))
+    crossword = benchmark.generate_grid(4, 0.2, 0)
+    fingerprint = solution_cache.dictionary_fingerprint(matrices)
+
+    first = forward_checking.solve_cached(cache, crossword, matrices, letter_index, fingerprint=fingerprint)
+    second = forward_checking.solve_cached(cache, crossword, matrices, letter_index, fresh=True,
+                                           fingerprint=fingerprint)
+    assert not np.array_equal(first, second)
+    fills = solution_cache.lookup_fills(cache, crossword, fingerprint)
+    assert [f.tobytes() for f in fills] == [first.tobytes(), second.tobytes()]
+
+
+def test_max_fills_keeps_the_newest(tmp_path):
+    cache = solution_cache.create_solution_cache(str(tmp_path), max_fills=2)
+    crossword = np.zeros((2, 3), dtype=np.uint8)
+    for value in (97, 98, 99):
+        solution_cache.store_fill(cache, crossword, 'words', fill((2, 3), value))
+
+    fills = solution_cache.lookup_fills(cache, crossword, 'words')
+    assert [int(f[0, 0]) for f in fills] == [98, 99]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = solution_cache.create_solution_cache(str(tmp_path), max_bytes=2 * (solution_cache.HEADER_SIZE + 6))
+    crosswords = [np.full((2, 3), cell, dtype=np.uint8) for cell in (0, 35, 36)]
+    for age, crossword in enumerate(crosswords[:2]):
+        solution_cache.store_fill(cache, crossword, 'words', fill((2, 3), 97))
+        grid, _ = solution_cache.canonical_grid(crossword)
+        os.utime(solution_cache.entry_path(cache, grid, 'words', True), ns=(age * 10 ** 9, age * 10 ** 9))
+
+    # the lookup makes the first entry the most recently used one
+    assert solution_cache.lookup_fills(cache, crosswords[0], 'words')
+    solution_cache.store_fill(cache, crosswords[2], 'words', fill((2, 3), 97))
+
+    assert cache.evictions == 1
+    assert solution_cache.lookup_fills(cache, crosswords[0], 'words')
+    assert not solution_cache.lookup_fills(cache, crosswords[1], 'words')
+    assert solution_cache.lookup_fills(cache, crosswords[2], 'words')
+
+
+@pytest.mark.parametrize('data', [solution_cache.MAGIC + b'\2\0\3\0abcd', solution_cache.MAGIC + b'\2\0',
+                                  b'CWFILL00\2\0\3\0abcdef'])
+def test_corrupt_entry_is_a_miss(tmp_path, data):
+    cache = solution_cache.create_solution_cache(str(tmp_path))
+    crossword = np.zeros((2, 3), dtype=np.uint8)
+    grid, _ = solution_cache.canonical_grid(crossword)
+    with open(solution_cache.entry_path(cache, grid, 'words', True), 'wb') as file:
+        file.write(data)
+
+    assert solution_cache.lookup_fills(cache, crossword, 'words') == []
+    assert cache.misses == 1
+    solution_cache.store_fill(cache, crossword, 'words', fill((2, 3), 97))
+    assert len(solution_cache.lookup_fills(cache, crossword, 'words')) == 1
@@ -0,0 +1,219 @@
+STRATEGIES = ('mrv', 'mrv_degree', 'domwdeg')
+
+
+class VariableOrdering:
+    def __init__(self, strategy, words, weights, lcv):
+        self.strategy = strategy
+        # try the values of each word by least constraining value instead of domain order
+        self.lcv = lcv
+        # not assigned words by ID, all of them in the heap
+        self.unassigned = {}
+        # binary heap of the not assigned words (smallest key first), index of each word in it and its key by ID
+        self.heap = []
+        self.position = {}
+        self.keys = {}
+        # position of each word in the word list, breaking ties
+        self.order = {w.id: i for i, w in enumerate(words)}
+        # weight of each crossing by pair of word IDs, incremented by the wipeouts it causes
+        self.weights = weights
+
+
+def create_ordering(words, strategy='mrv', weights=None, lcv=False):
+    """
+    Creates the variable ordering of a search over the given not assigned words
+    :param words: not assigned words
+    :param strategy: 'mrv' (fewest remaining values), 'mrv_degree' (then most crossings) or 'domwdeg'
+    (fewest remaining values per weighted crossing with a not assigned word)
+    :param weights: crossing weights learned by a previous search, None to start from 1
+    :param lcv: order the values by least constraining value
+    :return: VariableOrdering
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"unknown variable ordering {strategy!r}")
+
+    ordering = VariableOrdering(strategy, words, {} if weights is None else weights, lcv)
+    for w in words:
+        ordering.unassigned[w.id] = w
+    for w in words:
+        ordering.keys[w.id] = variable_key(ordering, w)
+        ordering.position[w.id] = len(ordering.heap)
+        ordering.heap.append(w)
+    for i in reversed(range(len(ordering.heap) // 2)):
+        sift_down(ordering, i)
+
+    return ordering
+
+
+def crossing_key(word_id, intersected_id):
+    """
+    Identifies the crossing of two words
+    :param word_id: ID of a word
+    :param intersected_id: ID of the crossed word
+    :return: key of the crossing in the weights
+    """
+    return (word_id, intersected_id) if word_id < intersected_id else (intersected_id, word_id)
+
+
+def weighted_degree(ordering, word):
+    """
+    Sums the weights of the crossings of a word with the not assigned words
+    :param ordering: VariableOrdering
+    :param word: word
+    :return: weighted degree
+    """
+    return sum(ordering.weights.get(crossing_key(word.id, inter.intersectedID), 1)
+               for inter in word.intersections if inter.intersectedID in ordering.unassigned)
+
+
+def variable_key(ordering, word):
+    """
+    Computes the priority of a word, the smallest key being assigned first
+    :param ordering: VariableOrdering
+    :param word: word
+    :return: key
+    """
+    if ordering.strategy == 'mrv':
+        return word.remainingValues, ordering.order[word.id]
+    if ordering.strategy == 'mrv_degree':
+        return word.remainingValues, -word.intersectionsNumber, ordering.order[word.id]
+
+    degree = weighted_degree(ordering, word)
+    return (word.remainingValues / degree if degree else float('inf')), ordering.order[word.id]
+
+
+def sift_up(ordering, i):
+    """
+    Moves a word of the heap towards the root until its parent has a smaller key
+    :param ordering: VariableOrdering
+    :param i: index of the word in the heap
+    :return: None
+    """
+    heap, keys, position = ordering.heap, ordering.keys, ordering.position
+    word = heap[i]
+    key = keys[word.id]
+
+    while i > 0:
+        parent = (i - 1) >> 1
+        if keys[heap[parent].id] <= key:
+            break
+        heap[i] = heap[parent]
+        position[heap[i].id] = i
+        i = parent
+
+    heap[i] = word
+    position[word.id] = i
+
+
+def sift_down(ordering, i):
+    """
+    Moves a word of the heap towards the leaves until its children have larger keys
+    :param ordering: VariableOrdering
+    :param i: index of the word in the heap
+    :return: None
+    """
+    heap, keys, position = ordering.heap, ordering.keys, ordering.position
+    word = heap[i]
+    key = keys[word.id]
+    size = len(heap)
+
+    while True:
+        child = 2 * i + 1
+        if child >= size:
+            break
+        if child + 1 < size and keys[heap[child + 1].id] < keys[heap[child].id]:
+            child += 1
+        if key <= keys[heap[child].id]:
+            break
+        heap[i] = heap[child]
+        position[heap[i].id] = i
+        i = child
+
+    heap[i] = word
+    position[word.id] = i
+
+
+def update_variable(ordering, word):
+    """
+    Moves a word in the heap after a change of its key. Assigned words are ignored.
+    :param ordering: VariableOrdering
+    :param word: word whose domain size or crossing weights changed
+    :return: None
+    """
+    i = ordering.position.get(word.id)
+    if i is None:
+        return
+
+    old_key = ordering.keys[word.id]
+    key = variable_key(ordering, word)
+    ordering.keys[word.id] = key
+    if key < old_key:
+        sift_up(ordering, i)
+    elif old_key < key:
+        sift_down(ordering, i)
+
+
+def update_neighbours(ordering, word):
+    """
+    Updates the keys of the not assigned words crossing a word that was just assigned or unassigned
+    :param ordering: VariableOrdering
+    :param word: word
+    :return: None
+    """
+    for inter in word.intersections:
+        intersected_word = ordering.unassigned.get(inter.intersectedID)
+        if intersected_word is not None:
+            update_variable(ordering, intersected_word)
+
+
+def pop_variable(ordering):
+    """
+    Selects the next word to assign and removes it from the not assigned words
+    :param ordering: VariableOrdering
+    :return: word with the smallest key
+    """
+    heap = ordering.heap
+    word = heap[0]
+    last = heap.pop()
+    del ordering.position[word.id]
+    del ordering.unassigned[word.id]
+    if heap:
+        heap[0] = last
+        ordering.position[last.id] = 0
+        sift_down(ordering, 0)
+
+    if ordering.strategy == 'domwdeg':
+        update_neighbours(ordering, word)
+    return word
+
+
+def push_variable(ordering, word):
+    """
+    Puts back a word whose assignment was undone
+    :param ordering: VariableOrdering
+    :param word: word
+    :return: None
+    """
+    ordering.unassigned[word.id] = word
+    ordering.keys[word.id] = variable_key(ordering, word)
+    ordering.position[word.id] = len(ordering.heap)
+    ordering.heap.append(word)
+    sift_up(ordering, len(ordering.heap) - 1)
+
+    if ordering.strategy == 'domwdeg':
+        update_neighbours(ordering, word)
+
+
+def bump_weight(ordering, word, intersected_word):
+    """
+    Increments the weight of the crossing of two words after it wiped out a domain
+    :param ordering: VariableOrdering
+    :param word: word
+    :param intersected_word: crossed word
+    :return: None
+    """
+    key = crossing_key(word.id, intersected_word.id)
+    ordering.weights[key] = ordering.weights.get(key, 1) + 1
+
+    if ordering.strategy == 'domwdeg':
+        update_variable(ordering, word)
+        update_variable(ordering, intersected_word)